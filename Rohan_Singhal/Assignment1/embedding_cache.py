@@ -0,0 +1,80 @@
+from langchain_core.embeddings import Embeddings
+from collections import OrderedDict
+import numpy as np
+import hashlib
+import logging
+import json
+import os
+
+logger = logging.getLogger("WebsearchRAG")
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Disk cache in front of an embeddings model. Vectors are kept in a memory-mapped
+    float32 matrix (max_rows rows, so the size is fixed) and index.json maps a hash of
+    the case/whitespace-normalized text to its row, least recently used first.
+    When the matrix is full the oldest row is overwritten.
+    """
+
+    def __init__(self, embeddings, model_name, cache_dir=".embedding_cache", max_rows=50000):
+        self.embeddings = embeddings
+        self.max_rows = max_rows
+        self.folder = os.path.join(cache_dir, model_name.replace("/", "_"))
+        os.makedirs(self.folder, exist_ok=True)
+        self.index_path = os.path.join(self.folder, "index.json")
+        self.vectors_path = os.path.join(self.folder, "vectors.npy")
+        self.rows = OrderedDict()
+        self.vectors = None
+
+        if os.path.exists(self.index_path) and os.path.exists(self.vectors_path):
+            self.vectors = np.load(self.vectors_path, mmap_mode="r+")
+            if self.vectors.shape[0] == max_rows:
+                with open(self.index_path) as f:
+                    self.rows = json.load(f, object_pairs_hook=OrderedDict)
+                logger.info(f"Loaded embedding cache with {len(self.rows)} entries")
+            else:
+                logger.info("Embedding cache was created with a different size, starting fresh")
+                self.vectors = None
+
+    @staticmethod
+    def key(text):
+        return hashlib.sha256(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+    def _free_row(self):
+        if len(self.rows) < self.max_rows:
+            return len(self.rows)
+        return self.rows.popitem(last=False)[1]
+
+    def embed_documents(self, texts):
+        keys = [self.key(text) for text in texts]
+        result = [None] * len(texts)
+        todo = {}
+        for i, k in enumerate(keys):
+            if k in self.rows:
+                self.rows.move_to_end(k)
+                result[i] = self.vectors[self.rows[k]].tolist()
+            else:
+                todo.setdefault(k, []).append(i)
+        logger.info(f"Embedding cache: {len(texts) - sum(len(idx) for idx in todo.values())}/{len(texts)} chunks already embedded")
+
+        if todo:
+            new_vectors = self.embeddings.embed_documents([texts[idx[0]] for idx in todo.values()])
+            if self.vectors is None:
+                self.vectors = np.lib.format.open_memmap(
+                    self.vectors_path, mode="w+", dtype=np.float32, shape=(self.max_rows, len(new_vectors[0]))
+                )
+            for (k, idx), vector in zip(todo.items(), new_vectors):
+                for i in idx:
+                    result[i] = list(vector)
+                row = self._free_row()
+                self.vectors[row] = vector
+                self.rows[k] = row
+            self.vectors.flush()
+
+        with open(self.index_path, "w") as f:
+            json.dump(self.rows, f)
+        return result
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
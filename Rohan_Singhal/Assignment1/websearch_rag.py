@@ -10,6 +10,7 @@ import logging
 import sys
 import time
 import traceback
+from embedding_cache import CachedEmbeddings
 
 logging.basicConfig(
     level=logging.INFO,
@@ -37,8 +38,9 @@ logger.info("Text splitter configured with chunk_size=500, overlap=50")
 
 try:
     logger.info("Initializing HuggingFace embeddings...")
-    embedding_function = HuggingFaceEmbeddings()
-    logger.info("Embeddings initialized successfully")
+    base_embeddings = HuggingFaceEmbeddings()
+    embedding_function = CachedEmbeddings(base_embeddings, base_embeddings.model_name)
+    logger.info("Embeddings initialized successfully (with on-disk cache)")
     
     logger.info("Creating in-memory vector store...")
     vector_Store = Chroma(embedding_function=embedding_function)
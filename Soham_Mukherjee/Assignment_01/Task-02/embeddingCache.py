@@ -0,0 +1,71 @@
+### requirements: numpy
+
+
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class EmbeddingCache:
+    # embeddings kept on disk so re-scraped text doesn't go through the model again.
+    # vectors.npy is a memory-mapped float32 matrix with max_rows rows, index.json maps
+    # sha256(normalized text) -> row. one folder per model, least recently used rows get reused when full
+    def __init__(self, model_name, dimension, cache_dir='.embedding_cache', max_rows=100000) ->None:
+        self.folder = os.path.join(cache_dir, model_name.replace('/', '_'))
+        self.dimension = dimension
+        self.max_rows = max_rows
+        os.makedirs(self.folder, exist_ok=True)
+        self.index_path = os.path.join(self.folder, 'index.json')
+        vectors_path = os.path.join(self.folder, 'vectors.npy')
+
+        # key -> row, oldest used first (json keeps the order, so LRU survives restarts)
+        self.rows = OrderedDict()
+        if os.path.exists(vectors_path) and os.path.exists(self.index_path):
+            self.vectors = np.load(vectors_path, mmap_mode='r+')
+            if self.vectors.shape == (max_rows, dimension):
+                with open(self.index_path) as f:
+                    self.rows = json.load(f, object_pairs_hook=OrderedDict)
+            else:
+                logging.info("cache was made with a different size, starting fresh")
+                del self.vectors
+        if not self.rows:
+            self.vectors = np.lib.format.open_memmap(vectors_path, mode='w+', dtype=np.float32, shape=(max_rows, dimension))
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(' '.join(text.lower().split()).encode('utf-8')).hexdigest()
+
+    def _free_row(self) -> int:
+        # rows fill up in order and are only given back by reusing the oldest one
+        if len(self.rows) < self.max_rows:
+            return len(self.rows)
+        return self.rows.popitem(last=False)[1]
+
+    def encode(self, texts: list, model) -> np.ndarray:
+        keys = [self.key(t) for t in texts]
+        result = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        todo = {}
+        for i, k in enumerate(keys):
+            if k in self.rows:
+                self.rows.move_to_end(k)
+                result[i] = self.vectors[self.rows[k]]
+            else:
+                todo.setdefault(k, []).append(i)
+
+        logging.info(f"embedding cache: {len(texts) - sum(len(idx) for idx in todo.values())} of {len(texts)} chunks already known")
+        if todo:
+            new_texts = [texts[idx[0]] for idx in todo.values()]
+            embeddings = np.array(model.encode(new_texts, convert_to_tensor=False, show_progress_bar=True)).astype('float32')
+            for (k, idx), vec in zip(todo.items(), embeddings):
+                result[idx] = vec
+                row = self._free_row()
+                self.vectors[row] = vec
+                self.rows[k] = row
+            self.vectors.flush()
+        with open(self.index_path, 'w') as f:
+            json.dump(self.rows, f)
+        return result
@@ -5,27 +5,60 @@ import logging
 import faiss
 import numpy as np
 from sentence_transformers import SentenceTransformer
+from embeddingCache import EmbeddingCache
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class VectorDatabase:
-    def __init__(self, model_name='all-MiniLM-L6-v2') ->None:
+    # index_type: 'flat' (exact), 'hnsw' or 'ivf' (approximate), or 'auto' = flat until flat_threshold docs, then hnsw
+    def __init__(self, model_name='all-MiniLM-L6-v2', index_type='auto', flat_threshold=50000,
+                 hnsw_m=32, ef_search=64, nprobe=16, cache_dir='.embedding_cache') ->None:
         logging.info(f"let's load the model: {model_name}")
         self.model = SentenceTransformer(model_name)
         self.dimension = self.model.get_sentence_embedding_dimension()
+        # pages we already embedded (same query again, or a site that keeps showing up) skip the model
+        self.cache = EmbeddingCache(model_name, self.dimension, cache_dir) if cache_dir else None
         self.index = None
         self.documents = []
+        self.index_type = index_type
+        self.flat_threshold = flat_threshold
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.nprobe = nprobe
+
+    def _make_index(self, vectors: np.ndarray):
+        kind = self.index_type
+        if kind == 'auto':
+            kind = 'flat' if len(vectors) < self.flat_threshold else 'hnsw'
+
+        if kind == 'hnsw':
+            index = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m)
+            index.hnsw.efSearch = self.ef_search
+        elif kind == 'ivf':
+            # ~4*sqrt(n) lists, but k-means needs at least 39 points per list
+            nlist = max(1, min(int(4 * np.sqrt(len(vectors))), len(vectors) // 39))
+            index = faiss.IndexIVFFlat(faiss.IndexFlatL2(self.dimension), self.dimension, nlist)
+            index.train(vectors)
+            index.nprobe = self.nprobe
+        else:
+            kind = 'flat'
+            index = faiss.IndexFlatL2(self.dimension)
+        return kind, index
 
     def build_index(self, documents: list) ->None:
         self.documents = documents
         texts = [doc['text'] for doc in self.documents]
         
         logging.info(f"making embeddings for {len(texts)} chunks, hang tight")
-        embeddings = self.model.encode(texts, convert_to_tensor=False, show_progress_bar=True)
+        if self.cache:
+            embeddings = self.cache.encode(texts, self.model)
+        else:
+            embeddings = self.model.encode(texts, convert_to_tensor=False, show_progress_bar=True)
         
-        logging.info(f"building the faiss index, dim={self.dimension}")
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.index.add(np.array(embeddings).astype('float32'))
+        vectors = np.array(embeddings).astype('float32')
+        kind, self.index = self._make_index(vectors)
+        logging.info(f"building the faiss {kind} index, dim={self.dimension}")
+        self.index.add(vectors)
         logging.info(f"all done, index has {self.index.ntotal} vectors")
 
     def search(self, query: str, k: int = 5) -> list:
@@ -37,6 +70,7 @@ class VectorDatabase:
         query_embedding = self.model.encode([query], convert_to_tensor=False)
         distances, indices = self.index.search(np.array(query_embedding).astype('float32'), k)
         
-        results = [self.documents[i] for i in indices[0]]
+        # approximate indexes pad with -1 when they find fewer than k
+        results = [self.documents[i] for i in indices[0] if i >= 0]
         logging.info(f"found {len(results)} good ones")
         return results
@@ -0,0 +1,71 @@
+"""Offline batch search: read one query per line, write one JSON result per line.
+
+Usage: python batch_search.py queries.txt -o results.jsonl [--quota serpapi_google=500]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from dataclasses import asdict
+
+import config
+from search_agents import DuckDuckGoSearchAgent, WikipediaSearchAgent, SerpApiSearchAgent, MultiSearchAgent, SearchAgent
+
+logging.basicConfig(level=config.LOG_LEVEL, format=config.LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+def _parse_quotas(values: list) -> dict:
+    quotas = {}
+    for value in values:
+        provider, _, limit = value.partition("=")
+        if not limit.isdigit():
+            raise argparse.ArgumentTypeError(f"Invalid quota '{value}', expected provider=N")
+        quotas[provider] = int(limit)
+    return quotas
+
+async def run_batch(queries: list, output_path: str, num_results: int, concurrency: int, quotas: dict):
+    agents = [
+        DuckDuckGoSearchAgent(base_delay=config.DUCKDUCKGO_DELAY),
+        WikipediaSearchAgent(base_delay=config.WIKIPEDIA_DELAY)]
+    if "SERPAPI_API_KEY" in os.environ:
+        agents.append(SerpApiSearchAgent(api_key=os.environ["SERPAPI_API_KEY"], base_delay=config.SERPAPI_DELAY))
+    else:
+        logger.warning("SERPAPI_API_KEY not set, running without SerpApi.")
+    multi_search = MultiSearchAgent(agents, max_concurrent=concurrency)
+
+    try:
+        with open(output_path, "w", encoding="utf-8") as out:
+            async for query, response in multi_search.search_many(queries, num_results, provider_quotas=quotas):
+                record = {"query": query, "success": response.success, "sources": response.source,
+                          "response_time": response.response_time,
+                          "results": [asdict(result) for result in response.results]}
+                out.write(json.dumps(record, default=str) + "\n")
+    finally:
+        await SearchAgent.close_http_client()
+
+    stats = multi_search.last_batch_stats
+    print(f"Completed {stats['completed']}/{stats['queries']} queries in {stats['elapsed']:.1f}s "
+          f"({stats['queries_per_second']:.2f} queries/s)")
+    print(f"Provider calls: {stats['provider_calls']}")
+    if stats["quota_exhausted"]:
+        print(f"Quota exhausted for: {', '.join(stats['quota_exhausted'])}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("query_file", help="Text file with one query per line")
+    parser.add_argument("-o", "--output", default="results.jsonl")
+    parser.add_argument("-n", "--num-results", type=int, default=10)
+    parser.add_argument("-c", "--concurrency", type=int, default=config.BATCH_SEARCH_CONCURRENCY,
+                        help="Global limit on in-flight provider calls")
+    parser.add_argument("--quota", action="append", default=[], metavar="PROVIDER=N",
+                        help="Maximum calls to a provider for the whole batch (repeatable)")
+    args = parser.parse_args()
+
+    with open(args.query_file, encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+    quotas = {**config.BATCH_SEARCH_PROVIDER_QUOTAS, **_parse_quotas(args.quota)}
+    asyncio.run(run_batch(queries, args.output, args.num_results, args.concurrency, quotas))
+
+if __name__ == "__main__":
+    main()
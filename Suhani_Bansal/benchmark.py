@@ -0,0 +1,350 @@
+"""Micro-benchmarks for the search / scrape / RAG pipeline.
+
+Usage: python benchmark.py <benchmark> [options]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+import aiohttp
+import numpy as np
+
+import config
+from http_client import PooledHTTPClient
+
+logging.basicConfig(level=logging.WARNING, format=config.LOG_FORMAT)
+
+def _summarize(label: str, latencies: list) -> dict:
+    arr = np.array(latencies) * 1000
+    stats = {"label": label, "n": len(arr), "mean_ms": float(arr.mean()),
+             "p50_ms": float(np.percentile(arr, 50)), "p95_ms": float(np.percentile(arr, 95))}
+    print(f"  {label:<20} n={stats['n']:<4} mean={stats['mean_ms']:8.1f}ms  p50={stats['p50_ms']:8.1f}ms  p95={stats['p95_ms']:8.1f}ms")
+    return stats
+
+# --- CONNECTION POOLING ---
+async def _timed_get(session: aiohttp.ClientSession, url: str, params: dict) -> float:
+    start = time.perf_counter()
+    async with session.get(url, params=params, timeout=15) as response:
+        await response.read()
+    return time.perf_counter() - start
+
+async def bench_pool(url: str, num_queries: int):
+    """Per-query latency with a fresh ClientSession per request vs the shared pooled client"""
+    params = {'action': 'query', 'format': 'json', 'list': 'search', 'srsearch': 'python', 'srlimit': 5}
+    print(f"Connection pooling benchmark: {num_queries} sequential queries against {url}")
+
+    fresh = []
+    for _ in range(num_queries):
+        start = time.perf_counter()
+        async with aiohttp.ClientSession() as session:
+            await _timed_get(session, url, params)
+        fresh.append(time.perf_counter() - start)
+
+    client, pooled = PooledHTTPClient.from_config(), []
+    try:
+        for _ in range(num_queries):
+            start = time.perf_counter()
+            await _timed_get(await client.get_session(), url, params)
+            pooled.append(time.perf_counter() - start)
+    finally:
+        await client.close()
+
+    before, after = _summarize("session per query", fresh), _summarize("pooled client", pooled)
+    print(f"  speedup (mean): {before['mean_ms'] / after['mean_ms']:.2f}x")
+
+# --- OFFLINE SEARCH (record/replay) ---
+async def bench_search_replay(fixtures_dir: str, num_queries: int, concurrency: int, latency: float, jitter: float, error_rate: float, seed: int):
+    """Per-provider and multi-agent latency plus batch throughput against recorded fixtures"""
+    from http_replay import ReplayServer, RECORD_NUM_RESULTS, build_agents, recorded_hosts, redirect_agents, recorded_queries
+    from search_agents import MultiSearchAgent, SearchAgent
+
+    server = await ReplayServer(fixtures_dir, latency=latency, jitter=jitter, error_rate=error_rate, seed=seed).start()
+    try:
+        queries = recorded_queries(server)[:num_queries]
+        if not queries:
+            print(f"No fixtures in {fixtures_dir}; record some with: python http_replay.py record {fixtures_dir} queries.txt")
+            return
+        # Same providers as were recorded, so the multi-agent fan-out matches the fixtures;
+        # unpaced so the benchmark measures the search layer itself
+        agents = build_agents(recorded_hosts(server), paced=False)
+        redirect_agents(agents, server)
+        print(f"Offline search benchmark: {len(queries)} queries, injected latency {latency * 1000:.0f}±{jitter * 1000:.0f}ms, "
+              f"error rate {error_rate:.0%}, seed {seed}")
+
+        for agent in agents:
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                await agent.search(query, RECORD_NUM_RESULTS)
+                latencies.append(time.perf_counter() - start)
+            _summarize(agent.source, latencies)
+
+        multi_search, latencies = MultiSearchAgent(agents, max_concurrent=len(agents)), []
+        for query in queries:
+            start = time.perf_counter()
+            await multi_search.search(query, RECORD_NUM_RESULTS)
+            latencies.append(time.perf_counter() - start)
+        _summarize("multi-agent", latencies)
+
+        batch_search = MultiSearchAgent(agents, max_concurrent=len(agents))
+        async for _ in batch_search.search_many(queries, RECORD_NUM_RESULTS, max_concurrent=concurrency): pass
+        stats = batch_search.last_batch_stats
+        print(f"  search_many: {stats['completed']} queries in {stats['elapsed']:.2f}s = {stats['queries_per_second']:.1f} queries/s "
+              f"(concurrency {concurrency})")
+        print(f"  server: {server.stats}")
+    finally:
+        await server.stop()
+        await SearchAgent.close_http_client()
+
+# --- EXTRACTION ---
+def _synthetic_page(i: int, paragraphs: int) -> str:
+    body = "".join(f"<p>Paragraph {j} of page {i}: " + "lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8 + "</p>"
+                   for j in range(paragraphs))
+    return (f"<html><head><title>Page {i}</title><script>var x = {i};</script></head><body><nav>menu</nav>"
+            f"<main><article><h1>Page {i}</h1>{body}<table><tr><td>cell</td></tr></table></article></main>"
+            f"<footer>footer</footer></body></html>")
+
+def _load_pages(page_dir: str, num_pages: int, paragraphs: int) -> list:
+    if not page_dir:
+        return [_synthetic_page(i, paragraphs) for i in range(num_pages)]
+    files = sorted(f for f in os.listdir(page_dir) if f.endswith((".html", ".htm")))[:num_pages]
+    pages = []
+    for name in files:
+        with open(os.path.join(page_dir, name), encoding="utf-8", errors="replace") as f: pages.append(f.read())
+    return pages
+
+async def _measure_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+async def bench_extract(pool_sizes: list, pages: list):
+    """Pages/second and worst event-loop stall for inline extraction vs process pools of various sizes"""
+    from scraper import WebScraperAgent
+    print(f"Extraction benchmark: {len(pages)} pages, avg {sum(map(len, pages)) / len(pages) / 1024:.0f} KiB")
+    for workers in pool_sizes:
+        scraper = WebScraperAgent(extraction_workers=workers)
+        try:
+            if workers: await scraper._extract(pages[0])  # spawn workers outside the timed region
+            stop = asyncio.Event()
+            lag_task = asyncio.create_task(_measure_loop_lag(stop))
+            start = time.perf_counter()
+            await asyncio.gather(*(scraper._extract(page) for page in pages))
+            elapsed = time.perf_counter() - start
+            stop.set()
+            worst_lag = await lag_task
+        finally:
+            await scraper.close()
+        label = "inline" if workers == 0 else f"{workers} workers"
+        print(f"  {label:<12} {len(pages) / elapsed:8.1f} pages/s   worst event-loop stall {worst_lag * 1000:7.1f}ms")
+
+def bench_extract_backends(backend_chains: list, pages: list):
+    """Mean per-stage extraction time for each backend chain, to pick the fastest"""
+    from extraction import extract_content
+    print(f"Extraction backend benchmark: {len(pages)} pages (inline, single process)")
+    for chain in backend_chains:
+        backends = tuple(chain.split(","))
+        totals, methods = {}, {}
+        for page in pages:
+            result = extract_content(page, backends=backends)
+            methods[result["method"]] = methods.get(result["method"], 0) + 1
+            for stage, seconds in result["timings"].items():
+                totals[stage] = totals.get(stage, 0.0) + seconds
+        breakdown = "  ".join(f"{stage}={seconds / len(pages) * 1000:.2f}ms" for stage, seconds in totals.items())
+        print(f"  {chain:<18} total={sum(totals.values()) / len(pages) * 1000:7.2f}ms/page  {breakdown}  methods={methods}")
+
+# --- VECTOR INDEX INGEST ---
+def bench_index_ingest(num_batches: int, batch_size: int, dimension: int, seed: int = 0):
+    """Per-batch ingest time as the corpus grows: full vstack + rebuild vs incremental append"""
+    import faiss
+    from vector_index import EmbeddingBuffer
+    rng = np.random.default_rng(seed)
+    batches = [rng.standard_normal((batch_size, dimension)).astype(np.float32) for _ in range(num_batches)]
+    print(f"Index ingest benchmark: {num_batches} batches x {batch_size} vectors, dim={dimension}")
+
+    def rebuild():
+        embeddings, timings = None, []
+        for batch in batches:
+            start = time.perf_counter()
+            embeddings = batch if embeddings is None else np.vstack([embeddings, batch])
+            index = faiss.IndexFlatIP(dimension)
+            normalized = embeddings.copy()
+            faiss.normalize_L2(normalized)
+            index.add(normalized)
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    def incremental():
+        buffer, index, timings = EmbeddingBuffer(dimension), faiss.IndexFlatIP(dimension), []
+        for batch in batches:
+            start = time.perf_counter()
+            vectors = batch.copy()
+            faiss.normalize_L2(vectors)
+            buffer.append(vectors)
+            index.add(vectors)
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    window = max(1, num_batches // 10)
+    for label, run in (("rebuild", rebuild), ("incremental", incremental)):
+        timings = np.array(run()) * 1000
+        print(f"  {label:<12} total={timings.sum():9.1f}ms  first {window} batches={timings[:window].mean():7.2f}ms/batch  "
+              f"last {window} batches={timings[-window:].mean():7.2f}ms/batch")
+
+def _clustered_vectors(rng, n: int, dimension: int, clusters: int = 256) -> np.ndarray:
+    """Normalised vectors drawn around random centres, closer to real embeddings than uniform noise"""
+    centres = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def bench_index_recall(num_vectors: int, num_queries: int, dimension: int, k: int,
+                       ef_search_values: list, nprobe_values: list, seed: int = 0):
+    """Recall@k and per-query latency of HNSW / IVF settings against the exact flat index"""
+    from vector_index import VectorIndex
+    rng = np.random.default_rng(seed)
+    vectors = _clustered_vectors(rng, num_vectors + num_queries, dimension)
+    corpus, queries = vectors[:num_vectors], vectors[num_vectors:]
+    print(f"Index recall benchmark: {num_vectors} vectors, {num_queries} queries, dim={dimension}, k={k}")
+
+    def build(kind: str):
+        index = VectorIndex(kind=kind, background=False)
+        start = time.perf_counter()
+        index.add(corpus)
+        index.wait()
+        return index, time.perf_counter() - start
+
+    def measure(label: str, index, truth, build_seconds: float):
+        latencies, hits = [], 0
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            _, ids = index.search(query[None, :], k)
+            latencies.append(time.perf_counter() - start)
+            hits += len(set(ids[0].tolist()) & truth[i])
+        lat = np.array(latencies) * 1000
+        print(f"  {label:<20} recall@{k}={hits / (len(queries) * k):.3f}  mean={lat.mean():6.3f}ms  "
+              f"p95={np.percentile(lat, 95):6.3f}ms  build={build_seconds:6.2f}s")
+
+    flat, flat_build = build("flat")
+    _, truth_ids = flat.index.search(queries, k)
+    truth = [set(row.tolist()) for row in truth_ids]
+    measure("flat (exact)", flat, truth, flat_build)
+
+    hnsw, hnsw_build = build("hnsw")
+    for ef in ef_search_values:
+        hnsw.index.hnsw.efSearch = ef
+        measure(f"hnsw efSearch={ef}", hnsw, truth, hnsw_build)
+
+    ivf, ivf_build = build("ivf")
+    for nprobe in nprobe_values:
+        ivf.index.nprobe = nprobe
+        measure(f"ivf nprobe={nprobe}", ivf, truth, ivf_build)
+
+def bench_keyword_search(corpus_sizes: list, num_queries: int, chunk_words: int, k: int = 5, seed: int = 0):
+    """Keyword query latency as the corpus grows: per-chunk Jaccard scan vs BM25 inverted index"""
+    from keyword_index import BM25Index
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"w{i}" for i in range(50_000)])
+    # Zipf-distributed words, like natural text: a few very common terms and a long tail
+    def words(n): return vocabulary[np.minimum(rng.zipf(1.2, n), len(vocabulary)) - 1]
+    queries = [" ".join(words(4)) for _ in range(num_queries)]
+    print(f"Keyword search benchmark: {num_queries} queries, {chunk_words} words/chunk, k={k}")
+
+    def jaccard_top_k(query, chunk_sets):
+        query_words = set(query.split())
+        scored = []
+        for i, chunk_words_set in enumerate(chunk_sets):
+            score = len(query_words & chunk_words_set) / len(query_words | chunk_words_set)
+            if score > 0: scored.append((score, i))
+        scored.sort(reverse=True)
+        return scored[:k]
+
+    for size in corpus_sizes:
+        chunks = [" ".join(words(chunk_words)) for _ in range(size)]
+        index = BM25Index()
+        start = time.perf_counter()
+        index.add(chunks)
+        build = time.perf_counter() - start
+        # The old path rebuilt these sets on every query; timing includes that, as it did in production
+        for label, search in (("jaccard scan", lambda q: jaccard_top_k(q, [set(c.split()) for c in chunks])),
+                              ("bm25 index", lambda q: index.top_k(q, k))):
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                search(query)
+                latencies.append(time.perf_counter() - start)
+            lat = np.array(latencies) * 1000
+            print(f"  {size:>7} chunks  {label:<13} mean={lat.mean():8.3f}ms  p95={np.percentile(lat, 95):8.3f}ms"
+                  + (f"  build={build:.2f}s" if label == "bm25 index" else ""))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    pool = subparsers.add_parser("pool", help="Fresh session per query vs pooled HTTP client")
+    pool.add_argument("--url", default="https://en.wikipedia.org/w/api.php")
+    pool.add_argument("-n", "--num-queries", type=int, default=20)
+
+    replay = subparsers.add_parser("search-replay", help="Search latency/throughput against recorded fixtures (no network)")
+    replay.add_argument("fixtures_dir")
+    replay.add_argument("-n", "--num-queries", type=int, default=50)
+    replay.add_argument("-c", "--concurrency", type=int, default=16)
+    replay.add_argument("--latency", type=float, default=0.05, help="Mean injected latency in seconds")
+    replay.add_argument("--jitter", type=float, default=0.02, help="Std-dev of injected latency in seconds")
+    replay.add_argument("--error-rate", type=float, default=0.0)
+    replay.add_argument("--seed", type=int, default=0)
+
+    extract = subparsers.add_parser("extract", help="Extraction pages/s at different process pool sizes")
+    extract.add_argument("--pool-sizes", type=int, nargs="+", default=[0, 1, 2, 4, 8])
+    extract.add_argument("-n", "--num-pages", type=int, default=200)
+    extract.add_argument("--paragraphs", type=int, default=200, help="Paragraphs per synthetic page")
+    extract.add_argument("--page-dir", help="Directory of saved .html pages to use instead of synthetic ones")
+
+    backends = subparsers.add_parser("extract-backends", help="Per-stage extraction timing for backend chains")
+    backends.add_argument("--chains", nargs="+", default=["trafilatura,lxml", "lxml"],
+                          help="Comma-separated backend chains, e.g. trafilatura,lxml")
+    backends.add_argument("-n", "--num-pages", type=int, default=100)
+    backends.add_argument("--paragraphs", type=int, default=200)
+    backends.add_argument("--page-dir")
+
+    ingest = subparsers.add_parser("index-ingest", help="Per-batch FAISS ingest cost as the corpus grows")
+    ingest.add_argument("--batches", type=int, default=200)
+    ingest.add_argument("--batch-size", type=int, default=256)
+    ingest.add_argument("--dim", type=int, default=384, help="Embedding size (384 for all-MiniLM-L6-v2)")
+
+    recall = subparsers.add_parser("index-recall", help="Recall vs latency of HNSW/IVF indexes against exact search")
+    recall.add_argument("-n", "--num-vectors", type=int, default=100_000)
+    recall.add_argument("-q", "--num-queries", type=int, default=500)
+    recall.add_argument("--dim", type=int, default=384)
+    recall.add_argument("-k", type=int, default=10)
+    recall.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128])
+    recall.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+
+    keyword = subparsers.add_parser("keyword", help="Keyword query latency: Jaccard scan vs BM25 inverted index")
+    keyword.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 50_000])
+    keyword.add_argument("-q", "--num-queries", type=int, default=50)
+    keyword.add_argument("--chunk-words", type=int, default=200)
+
+    args = parser.parse_args()
+    if args.benchmark == "pool":
+        asyncio.run(bench_pool(args.url, args.num_queries))
+    elif args.benchmark == "search-replay":
+        asyncio.run(bench_search_replay(args.fixtures_dir, args.num_queries, args.concurrency,
+                                        args.latency, args.jitter, args.error_rate, args.seed))
+    elif args.benchmark == "extract":
+        asyncio.run(bench_extract(args.pool_sizes, _load_pages(args.page_dir, args.num_pages, args.paragraphs)))
+    elif args.benchmark == "extract-backends":
+        bench_extract_backends(args.chains, _load_pages(args.page_dir, args.num_pages, args.paragraphs))
+    elif args.benchmark == "index-ingest":
+        bench_index_ingest(args.batches, args.batch_size, args.dim)
+    elif args.benchmark == "index-recall":
+        bench_index_recall(args.num_vectors, args.num_queries, args.dim, args.k, args.ef_search, args.nprobe)
+    elif args.benchmark == "keyword":
+        bench_keyword_search(args.sizes, args.num_queries, args.chunk_words)
+
+if __name__ == "__main__":
+    main()
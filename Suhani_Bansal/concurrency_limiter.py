@@ -0,0 +1,179 @@
+import asyncio
+import time
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+SUCCESS, OVERLOAD, ERROR = "success", "overload", "error"
+
+def classify_status(status: int) -> str:
+    """429 and 5xx mean the server is struggling; anything else is a healthy round trip"""
+    return OVERLOAD if status == 429 or status >= 500 else SUCCESS
+
+class AIMDLimiter:
+    """Concurrency limit with additive increase / multiplicative decrease.
+
+    Each healthy response grows the limit by increase / limit (about +increase per full window),
+    but only while the limit is actually in use and latency is under latency_target. An overload
+    (timeout, 429, 5xx) multiplies it by backoff; overloads from requests started before the last
+    cut are ignored, so one burst of failures only backs off once. With overload_sources > 1, the
+    limit is only cut once that many distinct sources (e.g. hosts) overloaded within overload_window
+    seconds since the last cut."""
+    def __init__(self, name: str, initial_limit: float = 4, min_limit: float = 1, max_limit: float = 64, increase: float = 1.0,
+                 backoff: float = 0.5, latency_target: Optional[float] = None, history: Optional[Deque] = None,
+                 overload_sources: int = 1, overload_window: float = 10.0):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.backoff = backoff
+        self.latency_target = latency_target
+        self.overload_sources = overload_sources
+        self.overload_window = overload_window
+        self.in_flight = 0
+        self.peak_limit = self.limit
+        self.history = history if history is not None else deque(maxlen=100)
+        self.counters = {"acquired": 0, "queued": 0, SUCCESS: 0, OVERLOAD: 0, ERROR: 0, "increases": 0, "decreases": 0}
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        self._recent_overloads: Dict[str, float] = {}
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    async def acquire(self):
+        self.counters["acquired"] += 1
+        if self._has_capacity() and not self._waiters:
+            self.in_flight += 1
+            return
+        self.counters["queued"] += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over just as we were cancelled: pass it on
+                self.in_flight -= 1
+                self._wake()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def _wake(self):
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _record(self, event: str, old: float, reason: str):
+        self.counters[event] += 1
+        self.history.append({"time": time.time(), "limiter": self.name, "event": event,
+                             "from": int(old), "to": int(self.limit), "reason": reason})
+
+    def _overload_confirmed(self, source: Optional[str]) -> bool:
+        """Whether enough distinct sources have overloaded recently to justify a cut"""
+        if self.overload_sources <= 1: return True
+        now = time.monotonic()
+        self._recent_overloads[source] = now
+        since = max(now - self.overload_window, self._last_decrease)
+        self._recent_overloads = {key: seen for key, seen in self._recent_overloads.items() if seen >= since}
+        return len(self._recent_overloads) >= self.overload_sources
+
+    def release(self, signal: str, started_at: float, latency: Optional[float] = None, source: Optional[str] = None):
+        saturated = self.in_flight >= int(self.limit) or bool(self._waiters)
+        self.in_flight -= 1
+        self.counters[signal] += 1
+        old = self.limit
+        if signal == OVERLOAD and started_at >= self._last_decrease and self._overload_confirmed(source):
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            self._last_decrease = time.monotonic()
+            self._record("decreases", old, "overload")
+            logger.info(f"Concurrency for {self.name} cut {int(old)} -> {int(self.limit)}")
+        elif signal == SUCCESS and saturated and (self.latency_target is None or latency is None or latency <= self.latency_target):
+            self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            if int(self.limit) > int(old): self._record("increases", old, "healthy")
+        self.peak_limit = max(self.peak_limit, self.limit)
+        self._wake()
+
+    def snapshot(self) -> dict:
+        return {"limit": int(self.limit), "in_flight": self.in_flight, "waiting": len(self._waiters),
+                "peak_limit": int(self.peak_limit), **self.counters}
+
+class ConcurrencySlot:
+    """One request's hold on its host and global limiters; the outcome is reported on exit"""
+    def __init__(self, limiters: List[AIMDLimiter], source: Optional[str] = None):
+        self.limiters = limiters
+        self.source = source
+        self.signal: Optional[str] = None
+        self.started_at = 0.0
+        # False when the caller shortened the timeout (e.g. to fit a request deadline): firing then is not overload
+        self.timeout_is_overload = True
+        self._acquired: List[AIMDLimiter] = []
+
+    def observe_status(self, status: int):
+        self.signal = classify_status(status)
+
+    @property
+    def overloaded(self) -> bool:
+        return self.signal == OVERLOAD
+
+    async def __aenter__(self):
+        try:
+            for limiter in self.limiters:
+                await limiter.acquire()
+                self._acquired.append(limiter)
+        except BaseException:
+            self._release(ERROR, None)
+            raise
+        self.started_at = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None: signal = self.signal or SUCCESS
+        elif issubclass(exc_type, asyncio.TimeoutError): signal = OVERLOAD if self.timeout_is_overload else ERROR
+        elif self.signal is not None: signal = self.signal  # e.g. a rejected or unparsable body after a good response
+        else: signal = ERROR
+        self._release(signal, time.monotonic() - self.started_at)
+
+    def _release(self, signal: str, latency: Optional[float]):
+        for limiter in reversed(self._acquired): limiter.release(signal, self.started_at, latency, self.source)
+        self._acquired = []
+
+class AdaptiveConcurrencyLimiter:
+    """A global AIMD limit plus one per host; every request needs a slot in both.
+
+    A slow or failing host only shrinks its own limit; the global limit is cut once timeouts/429/5xx
+    come from global_overload_hosts distinct hosts within overload_window seconds, so one bad host's
+    retries do not throttle every other host."""
+    def __init__(self, initial_limit: float = 5, min_limit: float = 1, max_limit: float = 32,
+                 host_initial_limit: float = 2, host_max_limit: float = 8, backoff: float = 0.5,
+                 latency_target: Optional[float] = 5.0, history_size: int = 200,
+                 global_overload_hosts: int = 2, overload_window: float = 10.0):
+        self.history: Deque[dict] = deque(maxlen=history_size)
+        self.host_settings = dict(initial_limit=host_initial_limit, min_limit=min_limit, max_limit=host_max_limit,
+                                  backoff=backoff, latency_target=latency_target, history=self.history)
+        self.global_limiter = AIMDLimiter("global", initial_limit=initial_limit, min_limit=min_limit, max_limit=max_limit,
+                                          backoff=backoff, latency_target=latency_target, history=self.history,
+                                          overload_sources=global_overload_hosts, overload_window=overload_window)
+        self._hosts: Dict[str, AIMDLimiter] = {}
+
+    def host(self, key: str) -> AIMDLimiter:
+        limiter = self._hosts.get(key)
+        if limiter is None: limiter = self._hosts[key] = AIMDLimiter(key, **self.host_settings)
+        return limiter
+
+    def slot(self, url: str) -> ConcurrencySlot:
+        # Host first, so a request waiting on a busy host does not hold a global slot meanwhile
+        host = urlparse(url).netloc.lower()
+        return ConcurrencySlot([self.host(host), self.global_limiter], source=host)
+
+    def stats(self) -> dict:
+        return {"global": self.global_limiter.snapshot(),
+                "hosts": {key: limiter.snapshot() for key, limiter in self._hosts.items()},
+                "recent_decisions": list(self.history)[-20:]}
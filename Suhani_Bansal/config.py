@@ -1,4 +1,5 @@
 import logging
+import os
 
 # --- LOGGING CONFIGURATION ---
 LOG_LEVEL = logging.INFO
@@ -8,15 +9,131 @@ LOG_FORMAT = '%(asctime)s - %(levelname)s - [%(name)s] - %(message)s'
 DUCKDUCKGO_DELAY = 1.0
 WIKIPEDIA_DELAY = 0.8
 SERPAPI_DELAY = 1.0
+# Fetch plain-text extracts for Wikipedia hits in one batched API call instead of scraping each page
+WIKIPEDIA_FETCH_EXTRACTS = True
+WIKIPEDIA_EXTRACT_INTRO_ONLY = True
+WIKIPEDIA_MIN_EXTRACT_CHARS = 100
 MULTI_SEARCH_CONCURRENCY = 3
+# Hedged search: stop waiting once enough unique results arrive or the budget (seconds) is spent
+MULTI_SEARCH_LATENCY_BUDGET = 8.0
+MULTI_SEARCH_HEDGED = True
+# Reciprocal rank fusion of provider rankings: score = sum(weight / (RRF_K + rank))
+RRF_K = 60
+RRF_PROVIDER_WEIGHTS = {"duckduckgo": 1.0, "wikipedia": 1.0, "serpapi_google": 1.2}
+# Provider health: EWMA smoothing, circuit opens at this error rate (after min requests) or
+# when a call exceeds PROVIDER_SLOW_LATENCY seconds, and stays open for PROVIDER_OPEN_SECONDS
+PROVIDER_HEALTH_EWMA_ALPHA = 0.3
+PROVIDER_FAILURE_THRESHOLD = 0.5
+PROVIDER_MIN_REQUESTS = 3
+PROVIDER_OPEN_SECONDS = 30.0
+PROVIDER_SLOW_LATENCY = 10.0
+# Batch search (batch_search.py / MultiSearchAgent.search_many)
+BATCH_SEARCH_CONCURRENCY = 16
+BATCH_SEARCH_PROVIDER_QUOTAS = {"serpapi_google": 250}
+SEARCH_RATE_LIMIT_BURST = 1
+# Per-provider overrides as (requests per second, burst); otherwise 1 / agent base_delay is used
+SEARCH_RATE_LIMITS = {}
+
+# --- SEARCH CACHE CONFIGURATION ---
+SEARCH_CACHE_ENABLED = True
+SEARCH_CACHE_MAX_ENTRIES = 1024
+SEARCH_CACHE_DB_PATH = None  # e.g. "search_cache.sqlite3" to persist across restarts
+SEARCH_CACHE_DEFAULT_TTL = 3600
+# Per-provider TTLs in seconds; SerpApi results are cached longer since each call is billed
+SEARCH_CACHE_TTLS = {"duckduckgo": 1800, "wikipedia": 86400, "serpapi_google": 21600}
+
+# --- HTTP CLIENT CONFIGURATION ---
+HTTP_POOL_LIMIT = 100
+HTTP_POOL_LIMIT_PER_HOST = 10
+HTTP_DNS_CACHE_TTL = 300
+HTTP_KEEPALIVE_TIMEOUT = 30.0
 
 # --- SCRAPER CONFIGURATION ---
 SCRAPER_MAX_RETRIES = 2
 SCRAPER_TIMEOUT = 20
 SCRAPER_RATE_LIMIT_DELAY = 1.0
+# Starting global concurrency; AIMD limits then grow on healthy responses and halve on timeouts/429/5xx
 SCRAPER_MAX_CONCURRENT = 5
+SCRAPER_CONCURRENCY_MIN = 1
+SCRAPER_CONCURRENCY_MAX = 32
+SCRAPER_HOST_CONCURRENCY_INITIAL = 2
+SCRAPER_HOST_CONCURRENCY_MAX = 8
+SCRAPER_CONCURRENCY_BACKOFF = 0.5
+# The global limit only backs off once this many distinct hosts overloaded within the window (seconds)
+SCRAPER_GLOBAL_OVERLOAD_HOSTS = 2
+SCRAPER_OVERLOAD_WINDOW = 10.0
+# Responses slower than this (seconds) stop the limits from growing
+SCRAPER_CONCURRENCY_LATENCY_TARGET = 5.0
+SCRAPER_RATE_LIMIT_BURST = 2
+# Worker processes for page extraction (0 = parse inline on the event loop)
+SCRAPER_EXTRACTION_WORKERS = min(4, os.cpu_count() or 1)
+# Main-text backends tried in order on the single parsed tree (see extraction.EXTRACTION_BACKENDS)
+SCRAPER_EXTRACTION_BACKENDS = ("trafilatura", "lxml")
+# Pages are streamed and abandoned past this size; other content types are skipped without downloading
+SCRAPER_MAX_BODY_BYTES = 5 * 1024 * 1024
+SCRAPER_ALLOWED_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+# Per-host overrides as (requests per second, burst); other hosts use 1 / SCRAPER_RATE_LIMIT_DELAY
+SCRAPER_HOST_RATE_LIMITS = {"en.wikipedia.org": (5.0, 5)}
+
+# --- PAGE CACHE CONFIGURATION ---
+# On-disk cache of scraped pages (compressed bodies + extracted text); None disables it
+PAGE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".page_cache")
+PAGE_CACHE_MAX_BYTES = 500 * 1024 * 1024
+# Seconds a cached page is served without asking the origin; after that it is revalidated
+PAGE_CACHE_DEFAULT_FRESHNESS = 6 * 3600
+PAGE_CACHE_DOMAIN_FRESHNESS = {
+    "wikipedia.org": 24 * 3600,
+    "github.com": 3600,
+    "news.google.com": 300,
+}
+
+# --- EMBEDDING CACHE CONFIGURATION ---
+# Chunk embeddings keyed by model + hash of the normalised text (memory-mapped matrix); None disables it
+EMBEDDING_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embedding_cache")
+# Size of the vector matrix; least recently used embeddings are dropped beyond it (~170k 384-d vectors)
+EMBEDDING_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# --- PIPELINE CONFIGURATION ---
+# Overall seconds per query_with_rag call (None = no limit); stages size timeouts and retries from what is left
+QUERY_TIME_BUDGET = 60.0
+# Search and scraping stop this many seconds before the deadline, leaving time to embed and answer
+QUERY_FINALIZE_RESERVE = 5.0
+# Rank search snippets against the query (one embedding batch) and scrape only the best pages
+SCRAPE_PRUNING_ENABLED = True
+SCRAPE_TOP_CANDIDATES = 5
+# Share of the remaining query budget the search may use before snippets are ranked
+SCRAPE_PRUNING_SEARCH_SHARE = 0.4
+# Minimum snippet relevance (cosine with embeddings, query-term coverage without) for a page to be scraped
+SCRAPE_MIN_SNIPPET_SCORE = 0.1
+# Stop scraping once this many indexed chunks score at least EARLY_STOP_MIN_SCORE (0 disables)
+EARLY_STOP_CONFIDENT_CHUNKS = 6
+EARLY_STOP_MIN_SCORE = 0.5
 
 # --- RAG AGENT CONFIGURATION ---
 RAG_CHUNK_SIZE = 400
 RAG_CHUNK_OVERLAP = 50
-RAG_USE_EMBEDDINGS = True
\ No newline at end of file
+RAG_USE_EMBEDDINGS = True
+# Pages per incremental indexing batch while scraping is still in progress
+RAG_INDEX_BATCH_SIZE = 2
+# Vector index: "auto" is exact (flat) below RAG_INDEX_FLAT_THRESHOLD chunks, then RAG_INDEX_APPROXIMATE;
+# or force "flat", "hnsw" or "ivf". Approximate indexes are (re)built in a background thread.
+RAG_INDEX_TYPE = "auto"
+RAG_INDEX_APPROXIMATE = "ivf"
+RAG_INDEX_FLAT_THRESHOLD = 50_000
+RAG_HNSW_M = 32
+RAG_HNSW_EF_SEARCH = 64
+RAG_IVF_NPROBE = 16
+# IVF centroids are retrained once the corpus has grown by this factor since the last training
+RAG_IVF_RETRAIN_GROWTH = 2.0
+# Near-duplicate pages/chunks (SimHash within this many differing bits) are merged before embedding
+RAG_DEDUP_ENABLED = True
+RAG_DEDUP_MAX_HAMMING = 3
+# BM25 keyword scoring (keyword-only search and re-ranking of embedding hits)
+RAG_BM25_K1 = 1.5
+RAG_BM25_B = 0.75
+# Hybrid retrieval: dense and BM25 each return top_k * RAG_HYBRID_CANDIDATES hits over the whole index,
+# fused by "weighted" score (RAG_DENSE_WEIGHT * cosine + rest * BM25) or "rrf" (reciprocal rank fusion)
+RAG_FUSION = "weighted"
+RAG_DENSE_WEIGHT = 0.7
+RAG_RRF_K = 60
+RAG_HYBRID_CANDIDATES = 3
\ No newline at end of file
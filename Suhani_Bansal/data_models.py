@@ -20,6 +20,7 @@ class SearchResponse:
     total_results: int
     response_time: float
     error_message: Optional[str] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
 
 @dataclass
 class ScrapedContent:
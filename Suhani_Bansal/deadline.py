@@ -0,0 +1,55 @@
+import math
+import time
+from typing import Optional
+
+class Deadline:
+    """Absolute time budget for one request, handed from stage to stage.
+
+    Stages ask how much time is left instead of using fixed timeouts, so retries, HTTP timeouts and
+    waits shrink as the budget runs down. Deadline(None) never expires."""
+    def __init__(self, seconds: Optional[float] = None):
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    @classmethod
+    def at(cls, expires_at: Optional[float]) -> "Deadline":
+        deadline = cls()
+        deadline.expires_at = expires_at
+        return deadline
+
+    @property
+    def bounded(self) -> bool:
+        return self.expires_at is not None
+
+    def remaining(self) -> float:
+        if self.expires_at is None: return math.inf
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: Optional[float] = None) -> Optional[float]:
+        """Seconds to wait for the next operation: the remaining budget, capped; None if both are unbounded"""
+        remaining = self.remaining()
+        if cap is not None: remaining = min(remaining, cap)
+        return None if math.isinf(remaining) else remaining
+
+    def within(self, seconds: Optional[float]) -> "Deadline":
+        """A sub-deadline ending after `seconds` or at this deadline, whichever comes first"""
+        if seconds is None: return self
+        end = time.monotonic() + seconds
+        return Deadline.at(end if self.expires_at is None else min(end, self.expires_at))
+
+    def share(self, fraction: float) -> "Deadline":
+        """A sub-deadline covering `fraction` of the time that is left"""
+        return self if self.expires_at is None else Deadline.at(time.monotonic() + self.remaining() * fraction)
+
+    def reserve(self, seconds: float) -> "Deadline":
+        """A sub-deadline ending `seconds` early, leaving time for the stages that follow"""
+        return self if self.expires_at is None else Deadline.at(self.expires_at - seconds)
+
+    def can_afford(self, seconds: float) -> bool:
+        return self.remaining() > seconds
+
+    def __repr__(self):
+        return "Deadline(unbounded)" if self.expires_at is None else f"Deadline(remaining={self.remaining():.2f}s)"
@@ -0,0 +1,141 @@
+"""Near-duplicate detection for pages and chunks before they are embedded.
+
+Each text gets a 64-bit SimHash over word shingles; two texts are near-duplicates when their
+fingerprints differ in at most max_hamming bits. Fingerprints are split into max_hamming + 1
+bands, so any near-duplicate shares at least one identical band (pigeonhole) and lookups only
+compare against the few entries in matching buckets instead of everything indexed so far.
+"""
+import hashlib
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from data_models import DocumentChunk, ScrapedContent
+
+logger = logging.getLogger(__name__)
+
+_BIT_WEIGHTS = np.uint64(1) << np.arange(64, dtype=np.uint64)
+
+def _shingles(text: str, size: int) -> List[str]:
+    words = text.lower().split()
+    if len(words) <= size: return [" ".join(words)]
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """64-bit SimHash of the word shingles of text"""
+    shingles = _shingles(text, shingle_size)
+    hashes = np.fromiter((int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+                         dtype=np.uint64, count=len(shingles))
+    bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    votes = bits.sum(axis=0).astype(np.int64) * 2 - len(shingles)
+    return int((votes > 0).astype(np.uint64) @ _BIT_WEIGHTS)
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+class SimHashIndex:
+    """Banded SimHash index returning the first stored item within max_hamming bits"""
+    def __init__(self, max_hamming: int = 3):
+        self.max_hamming = max_hamming
+        self.num_bands = max_hamming + 1
+        self.band_bits = 64 // self.num_bands
+        self._buckets: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        # Removed entries become None so the ids held by other buckets stay valid
+        self._entries: List[Optional[Tuple[int, object]]] = []
+        self._live = 0
+
+    def _bands(self, fingerprint: int):
+        mask = (1 << self.band_bits) - 1
+        return [(band, (fingerprint >> (band * self.band_bits)) & mask) for band in range(self.num_bands)]
+
+    def find(self, fingerprint: int) -> Optional[object]:
+        for key in self._bands(fingerprint):
+            for entry_id in self._buckets.get(key, ()):
+                stored, item = self._entries[entry_id]
+                if hamming(stored, fingerprint) <= self.max_hamming: return item
+        return None
+
+    def add(self, fingerprint: int, item: object):
+        entry_id = len(self._entries)
+        self._entries.append((fingerprint, item))
+        self._live += 1
+        for key in self._bands(fingerprint): self._buckets[key].append(entry_id)
+
+    def remove(self, fingerprint: int, match: Callable[[object], bool]) -> bool:
+        """Drop the entry stored under exactly this fingerprint whose item satisfies match"""
+        bands = self._bands(fingerprint)
+        for entry_id in self._buckets.get(bands[0], ()):
+            stored, item = self._entries[entry_id]
+            if stored == fingerprint and match(item):
+                for key in bands: self._buckets[key].remove(entry_id)
+                self._entries[entry_id] = None
+                self._live -= 1
+                return True
+        return False
+
+    def __len__(self):
+        return self._live
+
+class NearDuplicateFilter:
+    """Drops near-duplicate pages and chunks, merging their URLs into the copy that is kept.
+
+    The kept item's metadata['duplicate_sources'] lists the URLs of everything merged into it. Each
+    chunk has its own list: a chunk shared with another page (a footer, a disclaimer) does not make
+    that page a source of the rest of the kept page's chunks.
+    Texts shorter than min_words are always kept since their fingerprints are too noisy."""
+    def __init__(self, max_hamming: int = 3, shingle_size: int = 3, min_words: int = 20):
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+        self.documents = SimHashIndex(max_hamming)
+        self.chunks = SimHashIndex(max_hamming)
+        self.counters = {"documents_seen": 0, "documents_merged": 0, "chunks_seen": 0, "chunks_merged": 0, "embeddings_saved": 0}
+
+    def _merge(self, index: SimHashIndex, text: str, source_url: str, sources: List[str]) -> bool:
+        """Return True if text duplicates something already indexed, recording source_url on the kept copy"""
+        if len(text.split()) < self.min_words: return False
+        fingerprint = simhash(text, self.shingle_size)
+        kept = index.find(fingerprint)
+        if kept is None:
+            index.add(fingerprint, (source_url, sources))
+            return False
+        kept_url, kept_sources = kept
+        if source_url != kept_url and source_url not in kept_sources: kept_sources.append(source_url)
+        return True
+
+    def filter_documents(self, documents: List[ScrapedContent], chunk_count: Optional[Callable[[str], int]] = None) -> List[ScrapedContent]:
+        """Keep pages that are not near-duplicates; chunk_count(text) lets dropped pages count towards embeddings_saved"""
+        kept = []
+        for doc in documents:
+            self.counters["documents_seen"] += 1
+            if self._merge(self.documents, doc.content, doc.url, doc.metadata.setdefault("duplicate_sources", [])):
+                self.counters["documents_merged"] += 1
+                if chunk_count: self.counters["embeddings_saved"] += chunk_count(doc.content)
+                logger.info(f"Skipping {doc.url}: near-duplicate of an already indexed page.")
+            else:
+                kept.append(doc)
+        return kept
+
+    def filter_chunks(self, chunks: List[DocumentChunk]) -> List[DocumentChunk]:
+        kept = []
+        for chunk in chunks:
+            self.counters["chunks_seen"] += 1
+            if self._merge(self.chunks, chunk.content, chunk.source_url, chunk.metadata.setdefault("duplicate_sources", [])):
+                self.counters["chunks_merged"] += 1
+                self.counters["embeddings_saved"] += 1
+            else:
+                kept.append(chunk)
+        return kept
+
+    def forget(self, chunks: List[DocumentChunk], documents: List[ScrapedContent] = ()):
+        """Unregister chunks (and pages) that passed the filter but were never indexed, e.g. cut off at a
+        deadline, so ingesting them again is not taken for a duplicate of themselves"""
+        for index, items in ((self.chunks, [(c.content, c.source_url) for c in chunks]),
+                             (self.documents, [(d.content, d.url) for d in documents])):
+            for text, url in items:
+                if len(text.split()) >= self.min_words:
+                    index.remove(simhash(text, self.shingle_size), lambda item: item[0] == url)
+
+    def stats(self) -> dict:
+        return dict(self.counters)
@@ -0,0 +1,145 @@
+"""Persistent embedding cache keyed by model name and a hash of the normalised text.
+
+Each model gets its own directory holding a memory-mapped float32 matrix (vectors.f32) with a fixed
+number of rows derived from max_bytes, and a SQLite index mapping text hashes to rows and last use.
+Re-ingesting text that was embedded before, in this process or an earlier one, costs one hash and a
+row copy instead of a model forward pass. When the matrix is full, the least recently used rows are reused.
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def normalize_text(text: str) -> str:
+    """Case and whitespace folded: sentence-transformers' uncased MiniLM/BERT tokenizers ignore both"""
+    return " ".join(text.lower().split())
+
+class EmbeddingCache:
+    """On-disk text -> embedding cache for one model (see module docstring)"""
+    # SQLite caps the number of bound parameters per statement
+    LOOKUP_BATCH = 500
+
+    def __init__(self, cache_dir: str, model_name: str, dimension: int, max_bytes: int = 256 * 1024 * 1024,
+                 normalize: bool = True, evict_fraction: float = 0.1):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.normalize = normalize
+        self.capacity = max(1, max_bytes // (dimension * 4))
+        self.evict_batch = max(1, int(self.capacity * evict_fraction))
+        self.directory = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+        self.counters = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+        os.makedirs(self.directory, exist_ok=True)
+        # encode() runs in worker threads (see rag_agent), so share one connection behind a lock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS entries (text_hash TEXT PRIMARY KEY, row INTEGER UNIQUE, last_access REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+
+        path = os.path.join(self.directory, "vectors.f32")
+        expected_size = self.capacity * dimension * 4
+        if os.path.exists(path) and os.path.getsize(path) != expected_size:
+            logger.info(f"Embedding cache for {model_name} was created with another size or dimension; starting empty.")
+            self._db.execute("DELETE FROM entries")
+            os.remove(path)
+        self._db.commit()
+        self._vectors = np.memmap(path, dtype=np.float32, mode="r+" if os.path.exists(path) else "w+",
+                                  shape=(self.capacity, dimension))
+        used = {row for (row,) in self._db.execute("SELECT row FROM entries")}
+        self._next_row = max(used) + 1 if used else 0
+        self._free_rows = [row for row in range(self._next_row) if row not in used]
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256((normalize_text(text) if self.normalize else text).encode("utf-8")).hexdigest()
+
+    def lookup(self, texts: Sequence[str]) -> Tuple[np.ndarray, List[int]]:
+        """Cached vectors for texts (zero rows where missing) and the positions of the missing texts"""
+        keys = [self.key(text) for text in texts]
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        rows: Dict[str, int] = {}
+        with self._lock:
+            for start in range(0, len(keys), self.LOOKUP_BATCH):
+                batch = keys[start:start + self.LOOKUP_BATCH]
+                rows.update(self._db.execute(
+                    f"SELECT text_hash, row FROM entries WHERE text_hash IN ({','.join('?' * len(batch))})", batch).fetchall())
+            if rows:
+                now = time.time()
+                self._db.executemany("UPDATE entries SET last_access = ? WHERE text_hash = ?", [(now, key) for key in rows])
+                self._db.commit()
+            hit_positions = [i for i, key in enumerate(keys) if key in rows]
+            if hit_positions: vectors[hit_positions] = self._vectors[[rows[keys[i]] for i in hit_positions]]
+        missing = [i for i, key in enumerate(keys) if key not in rows]
+        self.counters["hits"] += len(hit_positions)
+        self.counters["misses"] += len(missing)
+        return vectors, missing
+
+    def _evict(self):
+        """Free the least recently used rows (called with the lock held)"""
+        oldest = self._db.execute("SELECT text_hash, row FROM entries ORDER BY last_access LIMIT ?", (self.evict_batch,)).fetchall()
+        self._db.executemany("DELETE FROM entries WHERE text_hash = ?", [(key,) for key, _ in oldest])
+        self._free_rows.extend(row for _, row in oldest)
+        self.counters["evicted"] += len(oldest)
+
+    def _allocate_row(self) -> int:
+        if self._free_rows: return self._free_rows.pop()
+        if self._next_row < self.capacity:
+            self._next_row += 1
+            return self._next_row - 1
+        self._evict()
+        return self._free_rows.pop()
+
+    def store(self, texts: Sequence[str], vectors: np.ndarray):
+        """Add embeddings for texts; texts already cached are left as they are"""
+        entries = dict(zip((self.key(text) for text in texts), vectors))
+        with self._lock:
+            keys, known = list(entries), set()
+            for start in range(0, len(keys), self.LOOKUP_BATCH):
+                batch = keys[start:start + self.LOOKUP_BATCH]
+                known.update(key for (key,) in self._db.execute(
+                    f"SELECT text_hash FROM entries WHERE text_hash IN ({','.join('?' * len(batch))})", batch))
+            # A batch larger than the whole cache would only evict itself; keep its first `capacity` entries
+            new = [(key, vector) for key, vector in entries.items() if key not in known][:self.capacity]
+            now, records = time.time(), []
+            for key, vector in new:
+                row = self._allocate_row()
+                self._vectors[row] = vector
+                records.append((key, row, now))
+            self._db.executemany("INSERT INTO entries (text_hash, row, last_access) VALUES (?, ?, ?)", records)
+            self._db.commit()
+            self._vectors.flush()
+        self.counters["stored"] += len(records)
+
+    def encode(self, texts: Sequence[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Embeddings for texts, calling encode_fn only for texts not in the cache (each distinct text once)"""
+        vectors, missing = self.lookup(texts)
+        if not missing: return vectors
+        positions: Dict[str, List[int]] = {}
+        for i in missing: positions.setdefault(self.key(texts[i]), []).append(i)
+        to_encode = [texts[group[0]] for group in positions.values()]
+        encoded = np.asarray(encode_fn(to_encode), dtype=np.float32)
+        for group, vector in zip(positions.values(), encoded): vectors[group] = vector
+        self.store(to_encode, encoded)
+        return vectors
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        stats = {**self.counters, "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+                 "capacity": self.capacity, "model": self.model_name}
+        with self._lock:
+            # After close() only the in-memory counters are left
+            if self._db is not None: stats["entries"] = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._db is None: return
+            self._vectors.flush()
+            self._db.close()
+            self._db = None
@@ -0,0 +1,117 @@
+"""Single-pass page extraction.
+
+Each page is parsed once into an lxml tree; title, tables and outlinks are read from that tree and
+the main text comes from the first backend in the chain that returns something. Backends are
+plain functions tree -> Optional[str] registered in EXTRACTION_BACKENDS. Everything here is
+module-level and picklable so it can run in a ProcessPoolExecutor worker.
+"""
+import re
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+from urllib.parse import urljoin
+
+try:
+    import lxml.html
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+try:
+    import trafilatura
+    TRAFILATURA_AVAILABLE = True
+except ImportError:
+    TRAFILATURA_AVAILABLE = False
+
+SCRAPING_AVAILABLE = LXML_AVAILABLE
+
+MAX_OUTLINKS = 200
+MAX_TABLES = 20
+BOILERPLATE_TAGS = ('script', 'style', 'noscript', 'nav', 'header', 'footer', 'aside')
+_DISALLOWED_CHARS = re.compile(r'[^\w\s\.,!?;:()\-"]+')
+
+def clean_text(text: str) -> str:
+    """Drop disallowed characters and collapse whitespace in one pass over the text"""
+    return " ".join(_DISALLOWED_CHARS.sub("", text).split())
+
+def _trafilatura_main_text(tree) -> Optional[str]:
+    if not TRAFILATURA_AVAILABLE: return None
+    # trafilatura works on its own copy of a tree it is handed, so the shared tree stays intact
+    return trafilatura.extract(tree, include_comments=False, include_tables=True)
+
+def _lxml_main_text(tree) -> Optional[str]:
+    for element in list(tree.iter(*BOILERPLATE_TAGS)):
+        if element.getparent() is not None: element.drop_tree()
+    main = next(iter(tree.iter('main', 'article')), None)
+    if main is None: main = tree.find('.//body')
+    if main is None: main = tree
+    return main.text_content()
+
+EXTRACTION_BACKENDS: Dict[str, Callable] = {
+    "trafilatura": _trafilatura_main_text,
+    "lxml": _lxml_main_text,
+}
+
+def _tables(tree) -> List[List[List[str]]]:
+    tables = []
+    for table in tree.iter('table'):
+        rows = [[" ".join(cell.text_content().split()) for cell in row.iter('td', 'th')] for row in table.iter('tr')]
+        rows = [row for row in rows if any(row)]
+        if rows: tables.append(rows)
+        if len(tables) >= MAX_TABLES: break
+    return tables
+
+def _outlinks(tree, base_url: str) -> List[str]:
+    links, seen = [], set()
+    for anchor in tree.iter('a'):
+        href = (anchor.get('href') or '').strip()
+        if not href or href.startswith(('#', 'javascript:', 'mailto:')): continue
+        href = urljoin(base_url, href) if base_url else href
+        if href not in seen:
+            seen.add(href)
+            links.append(href)
+            if len(links) >= MAX_OUTLINKS: break
+    return links
+
+def extract_content(html: str, url: str = "", backends: Sequence[str] = ("trafilatura", "lxml")) -> dict:
+    """Extract title, main text, tables and outlinks from an HTML page with a single parse.
+
+    Returns {"title", "content", "method", "tables", "outlinks", "timings"}, where timings holds
+    seconds spent in each stage (parse, metadata, main_text, clean)."""
+    if not LXML_AVAILABLE: raise ImportError("lxml is required for content extraction")
+    timings, stage_start = {}, time.perf_counter()
+
+    def lap(stage: str):
+        nonlocal stage_start
+        now = time.perf_counter()
+        timings[stage] = now - stage_start
+        stage_start = now
+
+    tree = None
+    if html and html.strip():
+        try:
+            tree = lxml.html.fromstring(html)
+        except ValueError:
+            # str input with an XML encoding declaration has to be parsed from bytes
+            tree = lxml.html.fromstring(html.encode("utf-8"))
+        except etree.ParserError:
+            tree = None
+    lap("parse")
+    if tree is None:
+        return {"title": "No Title", "content": "", "method": "none", "tables": [], "outlinks": [], "timings": timings}
+
+    title = " ".join((tree.findtext('.//title') or "").split()) or "No Title"
+    tables, outlinks = _tables(tree), _outlinks(tree, url)
+    lap("metadata")
+
+    content, method = "", "none"
+    for name in backends:
+        text = EXTRACTION_BACKENDS[name](tree)
+        if text:
+            content, method = text, name
+            break
+    lap("main_text")
+
+    content = clean_text(content)
+    lap("clean")
+    return {"title": title, "content": content, "method": method, "tables": tables, "outlinks": outlinks, "timings": timings}
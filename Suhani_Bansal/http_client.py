@@ -0,0 +1,43 @@
+import aiohttp
+import logging
+from typing import Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+class PooledHTTPClient:
+    """Long-lived aiohttp session with a keep-alive connection pool and DNS cache"""
+    def __init__(self, limit: int = 100, limit_per_host: int = 10, dns_cache_ttl: int = 300, keepalive_timeout: float = 30.0):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @classmethod
+    def from_config(cls) -> "PooledHTTPClient":
+        return cls(
+            limit=config.HTTP_POOL_LIMIT, limit_per_host=config.HTTP_POOL_LIMIT_PER_HOST,
+            dns_cache_ttl=config.HTTP_DNS_CACHE_TTL, keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT)
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it lazily on the running event loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit, limit_per_host=self.limit_per_host,
+                use_dns_cache=True, ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout)
+            self._session = aiohttp.ClientSession(connector=connector)
+            logger.info(f"Opened pooled HTTP session (limit={self.limit}, limit_per_host={self.limit_per_host}).")
+        return self._session
+
+    @property
+    def is_open(self) -> bool:
+        return self._session is not None and not self._session.closed
+
+    async def close(self):
+        if self.is_open:
+            await self._session.close()
+            logger.info("Closed pooled HTTP session.")
+        self._session = None
@@ -0,0 +1,233 @@
+"""Record/replay HTTP fixtures for the search agents.
+
+The ReplayServer is a local stand-in for the search providers. Agents are pointed at it with
+redirect_agents(); a request for https://<host>/<path>?<query> becomes
+http://127.0.0.1:<port>/<host>/<path>?<query>. In record mode, fixtures that are missing are
+fetched from the real provider and saved. In replay mode only saved fixtures are served, with
+optional injected latency and errors.
+
+Usage:
+  python http_replay.py record fixtures/ queries.txt     # capture live responses
+  python http_replay.py serve fixtures/ --latency 0.2    # serve fixtures for manual testing
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+from typing import Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from aiohttp import web
+
+import config
+from http_client import PooledHTTPClient
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that never go into a fixture key or file
+SECRET_PARAMS = {"api_key", "key", "token"}
+# num_results used when recording; replayed searches must use the same value to hit the fixtures
+RECORD_NUM_RESULTS = 10
+
+def fixture_key(method: str, url: str) -> str:
+    parts = urlsplit(url)
+    params = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in SECRET_PARAMS)
+    canonical = f"{method.upper()} {parts.netloc.lower()}{parts.path}?{urlencode(params)}"
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+class ReplayServer:
+    """Local HTTP server that records and replays provider responses"""
+    def __init__(self, fixtures_dir: str, record: bool = False, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, seed: Optional[int] = None):
+        self.fixtures_dir = fixtures_dir
+        self.record = record
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.http_client = PooledHTTPClient.from_config() if record else None
+        self.stats = {"served": 0, "recorded": 0, "missing": 0, "injected_errors": 0}
+        self._runner: Optional[web.AppRunner] = None
+        self.port: Optional[int] = None
+        os.makedirs(fixtures_dir, exist_ok=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def url_for(self, upstream_url: str) -> str:
+        parts = urlsplit(upstream_url)
+        query = f"?{parts.query}" if parts.query else ""
+        return f"{self.base_url}/{parts.netloc}{parts.path}{query}"
+
+    def _fixture_path(self, key: str) -> str:
+        return os.path.join(self.fixtures_dir, f"{key}.json")
+
+    def load_fixture(self, key: str) -> Optional[dict]:
+        path = self._fixture_path(key)
+        if not os.path.exists(path): return None
+        with open(path, encoding="utf-8") as f: return json.load(f)
+
+    def fixtures(self) -> List[dict]:
+        loaded = []
+        for name in sorted(os.listdir(self.fixtures_dir)):
+            if name.endswith(".json"):
+                with open(os.path.join(self.fixtures_dir, name), encoding="utf-8") as f: loaded.append(json.load(f))
+        return loaded
+
+    async def _fetch_upstream(self, method: str, upstream_url: str, headers: dict) -> dict:
+        session = await self.http_client.get_session()
+        forwarded = {k: v for k, v in headers.items() if k.lower() in ("user-agent", "accept", "accept-language")}
+        async with session.request(method, upstream_url, headers=forwarded, timeout=30) as response:
+            body = await response.text()
+            parts = urlsplit(upstream_url)
+            params = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in SECRET_PARAMS]
+            return {"method": method, "url": f"{parts.scheme}://{parts.netloc}{parts.path}", "params": dict(params),
+                    "status": response.status, "content_type": response.content_type, "body": body}
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        host, _, path = request.match_info["target"].partition("/")
+        query = f"?{request.query_string}" if request.query_string else ""
+        upstream_url = f"https://{host}/{path}{query}"
+        key = fixture_key(request.method, upstream_url)
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.random.gauss(self.latency, self.jitter)))
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.stats["injected_errors"] += 1
+            return web.Response(status=self.error_status, text="Injected error")
+
+        fixture = self.load_fixture(key)
+        if fixture is None and self.record:
+            fixture = await self._fetch_upstream(request.method, upstream_url, dict(request.headers))
+            with open(self._fixture_path(key), "w", encoding="utf-8") as f: json.dump(fixture, f, indent=1)
+            self.stats["recorded"] += 1
+            logger.info(f"Recorded fixture {key} for {fixture['url']}")
+        if fixture is None:
+            self.stats["missing"] += 1
+            logger.warning(f"No fixture for {upstream_url}")
+            return web.Response(status=404, text=f"No fixture for {upstream_url}")
+
+        self.stats["served"] += 1
+        return web.Response(status=fixture["status"], text=fixture["body"], content_type=fixture["content_type"])
+
+    async def start(self, port: int = 0) -> "ReplayServer":
+        app = web.Application()
+        app.router.add_route("*", "/{target:.+}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"Replay server listening on {self.base_url} ({'record' if self.record else 'replay'} mode)")
+        return self
+
+    async def stop(self):
+        if self._runner: await self._runner.cleanup()
+        if self.http_client: await self.http_client.close()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+def redirect_agents(agents: list, server: ReplayServer) -> List[Tuple[object, str]]:
+    """Point each agent's search_url at the server. Returns (agent, original_url) pairs for restore_agents."""
+    originals = []
+    for agent in agents:
+        originals.append((agent, agent.search_url))
+        agent.search_url = server.url_for(agent.search_url)
+    return originals
+
+def build_agents(hosts: Iterable[str], api_key: Optional[str] = None, paced: bool = True) -> list:
+    """Search agents for the providers whose hosts are given, always in the same order.
+
+    Recording and replay must build the same list: the multi-agent fan-out asks each provider for
+    num_results // len(agents) + 2 results, so a different agent set means different request URLs."""
+    from search_agents import DuckDuckGoSearchAgent, WikipediaSearchAgent, SerpApiSearchAgent
+    hosts, agents = set(hosts), []
+    for agent_class, delay in ((DuckDuckGoSearchAgent, config.DUCKDUCKGO_DELAY), (WikipediaSearchAgent, config.WIKIPEDIA_DELAY),
+                               (SerpApiSearchAgent, config.SERPAPI_DELAY)):
+        if urlsplit(agent_class.search_url).netloc not in hosts: continue
+        kwargs = {"base_delay": delay if paced else 0}
+        # The key is stripped from fixture keys, so any placeholder works in replay
+        if agent_class is SerpApiSearchAgent: kwargs["api_key"] = api_key or "replay"
+        agents.append(agent_class(**kwargs))
+    return agents
+
+def recorded_hosts(server: ReplayServer) -> Set[str]:
+    """Provider hosts present in the fixtures"""
+    return {urlsplit(fixture["url"]).netloc for fixture in server.fixtures()}
+
+def restore_agents(originals: List[Tuple[object, str]]):
+    for agent, url in originals: agent.search_url = url
+
+def recorded_queries(server: ReplayServer) -> List[str]:
+    """Distinct search queries present in the fixtures, in a stable order"""
+    queries = []
+    for fixture in server.fixtures():
+        params = fixture.get("params", {})
+        query = params.get("q") or params.get("srsearch")
+        if query and query not in queries: queries.append(query)
+    return queries
+
+async def _record(fixtures_dir: str, query_file: str):
+    from search_agents import DuckDuckGoSearchAgent, WikipediaSearchAgent, SerpApiSearchAgent, MultiSearchAgent, SearchAgent
+    with open(query_file, encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+    api_key = os.environ.get("SERPAPI_API_KEY")
+    hosts = {urlsplit(DuckDuckGoSearchAgent.search_url).netloc, urlsplit(WikipediaSearchAgent.search_url).netloc}
+    if api_key: hosts.add(urlsplit(SerpApiSearchAgent.search_url).netloc)
+    async with ReplayServer(fixtures_dir, record=True) as server:
+        missing = recorded_hosts(server) - hosts
+        if missing:
+            # Replay builds agents for every provider in the directory; recording without one changes the fan-out
+            raise SystemExit(f"{fixtures_dir} has fixtures for {sorted(missing)}, which cannot be recorded now "
+                             f"(set SERPAPI_API_KEY or use a new directory)")
+        agents = build_agents(hosts, api_key=api_key)
+        redirect_agents(agents, server)
+        try:
+            # Capture both request shapes the benchmarks replay: single agents and the multi-agent fan-out
+            multi_search = MultiSearchAgent(agents, max_concurrent=len(agents))
+            for query in queries:
+                await asyncio.gather(*(agent.search(query, RECORD_NUM_RESULTS) for agent in agents))
+                await multi_search.search(query, RECORD_NUM_RESULTS)
+        finally:
+            await SearchAgent.close_http_client()
+        print(f"Recorded {server.stats['recorded']} new fixtures for {len(queries)} queries into {fixtures_dir}")
+
+async def _serve(fixtures_dir: str, port: int, latency: float, jitter: float, error_rate: float):
+    server = await ReplayServer(fixtures_dir, latency=latency, jitter=jitter, error_rate=error_rate).start(port)
+    try:
+        print(f"Serving {len(server.fixtures())} fixtures on {server.base_url} (Ctrl+C to stop)")
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+def main():
+    logging.basicConfig(level=config.LOG_LEVEL, format=config.LOG_FORMAT)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record = subparsers.add_parser("record", help="Run queries against live providers and save fixtures")
+    record.add_argument("fixtures_dir")
+    record.add_argument("query_file")
+    serve = subparsers.add_parser("serve", help="Serve saved fixtures")
+    serve.add_argument("fixtures_dir")
+    serve.add_argument("--port", type=int, default=8808)
+    serve.add_argument("--latency", type=float, default=0.0, help="Mean injected latency in seconds")
+    serve.add_argument("--jitter", type=float, default=0.0, help="Std-dev of injected latency in seconds")
+    serve.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 503")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        asyncio.run(_record(args.fixtures_dir, args.query_file))
+    else:
+        asyncio.run(_serve(args.fixtures_dir, args.port, args.latency, args.jitter, args.error_rate))
+
+if __name__ == "__main__":
+    main()
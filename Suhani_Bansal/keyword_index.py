@@ -0,0 +1,92 @@
+"""BM25 keyword scoring over an incrementally maintained inverted index.
+
+Each term keeps a postings list of (chunk id, term frequency) in typed arrays that NumPy can view
+without copying. A query only touches the postings of its own terms, so scoring cost follows the
+number of matching chunks rather than the total number of words indexed.
+"""
+import math
+import re
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from ranking import top_k_ids
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+class BM25Index:
+    """Okapi BM25 over documents numbered in insertion order (document i = i-th text added)"""
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._lengths = array("f")
+        self._total_length = 0.0
+
+    def __len__(self):
+        return len(self._lengths)
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._postings)
+
+    def add(self, texts: Iterable[str]):
+        """Index texts as the next document ids; only their own terms' postings are touched"""
+        for text in texts:
+            doc_id = len(self._lengths)
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                postings = self._postings.get(term)
+                if postings is None: postings = self._postings[term] = (array("q"), array("f"))
+                postings[0].append(doc_id)
+                postings[1].append(tf)
+            length = sum(counts.values())
+            self._lengths.append(length)
+            self._total_length += length
+
+    def clear(self):
+        self._postings.clear()
+        self._lengths = array("f")
+        self._total_length = 0.0
+
+    def _idf(self, doc_freq: int) -> float:
+        n = len(self._lengths)
+        return math.log(1 + (n - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def scores(self, query: str, normalize: bool = True) -> np.ndarray:
+        """BM25 score of every document for the query.
+
+        With normalize, scores are divided by the query's upper bound (every term with very high
+        frequency), giving values in [0, 1] that can be compared across queries and mixed with cosine scores."""
+        n = len(self._lengths)
+        scores = np.zeros(n, dtype=np.float32)
+        if n == 0: return scores
+        lengths = np.frombuffer(self._lengths, dtype=np.float32)
+        avg_length = self._total_length / n or 1.0
+        upper_bound = 0.0
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is None: continue
+            ids = np.frombuffer(postings[0], dtype=np.int64)
+            tf = np.frombuffer(postings[1], dtype=np.float32)
+            idf = self._idf(len(ids))
+            norm = self.k1 * (1 - self.b + self.b * lengths[ids] / avg_length)
+            scores[ids] += idf * tf * (self.k1 + 1) / (tf + norm)
+            upper_bound += idf * (self.k1 + 1)
+        if normalize and upper_bound > 0: scores /= upper_bound
+        return scores
+
+    def top_k(self, query: str, k: int, normalize: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """(scores, ids) of the k best matching documents, best first; documents scoring 0 are left out"""
+        scores = self.scores(query, normalize)
+        ids = top_k_ids(scores, k, positive_only=True)
+        return scores[ids], ids
+
+    def stats(self) -> dict:
+        return {"documents": len(self), "terms": self.vocabulary_size,
+                "avg_length": round(self._total_length / len(self), 1) if len(self) else 0.0}
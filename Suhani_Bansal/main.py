@@ -28,7 +28,7 @@ async def test_robust_system():
         search_agents=[
             DuckDuckGoSearchAgent(base_delay=config.DUCKDUCKGO_DELAY),
             WikipediaSearchAgent(base_delay=config.WIKIPEDIA_DELAY),
-            SerpApiSearchAgent(api_key=os.environ["SERPAPI_API_KEY"]),
+            SerpApiSearchAgent(api_key=os.environ["SERPAPI_API_KEY"], base_delay=config.SERPAPI_DELAY),
             # If you add the Reddit agent, uncomment this line:
             # RedditSearchAgent(base_delay=config.REDDIT_DELAY)
         ],
@@ -36,62 +36,91 @@ async def test_robust_system():
         scraper_config={
             'max_retries': config.SCRAPER_MAX_RETRIES,
             'timeout': config.SCRAPER_TIMEOUT,
-            'rate_limit_delay': config.SCRAPER_RATE_LIMIT_DELAY
+            'rate_limit_delay': config.SCRAPER_RATE_LIMIT_DELAY,
+            'extraction_workers': config.SCRAPER_EXTRACTION_WORKERS
         },
         rag_config={
             'chunk_size': config.RAG_CHUNK_SIZE,
-            'chunk_overlap': config.RAG_CHUNK_OVERLAP
+            'chunk_overlap': config.RAG_CHUNK_OVERLAP,
+            'dedup': config.RAG_DEDUP_ENABLED,
+            'dedup_max_hamming': config.RAG_DEDUP_MAX_HAMMING,
+            'bm25_k1': config.RAG_BM25_K1,
+            'bm25_b': config.RAG_BM25_B,
+            'fusion': config.RAG_FUSION,
+            'dense_weight': config.RAG_DENSE_WEIGHT,
+            'rrf_k': config.RAG_RRF_K,
+            'hybrid_candidates': config.RAG_HYBRID_CANDIDATES,
+            'embedding_cache_dir': config.EMBEDDING_CACHE_DIR,
+            'embedding_cache_max_bytes': config.EMBEDDING_CACHE_MAX_BYTES,
+            'index_config': {
+                'kind': config.RAG_INDEX_TYPE, 'approximate': config.RAG_INDEX_APPROXIMATE,
+                'flat_threshold': config.RAG_INDEX_FLAT_THRESHOLD, 'hnsw_m': config.RAG_HNSW_M,
+                'hnsw_ef_search': config.RAG_HNSW_EF_SEARCH, 'ivf_nprobe': config.RAG_IVF_NPROBE,
+                'ivf_retrain_growth': config.RAG_IVF_RETRAIN_GROWTH
+            }
         }
     )
 
-    while True:
-        user_query = input("\nEnter your query (or type 'exit' to quit): ")
-        if user_query.lower().strip() in ['exit', 'quit']:
-            print("Exiting.")
-            break
+    try:
+        while True:
+            user_query = input("\nEnter your query (or type 'exit' to quit): ")
+            if user_query.lower().strip() in ['exit', 'quit']:
+                print("Exiting.")
+                break
         
-        if not user_query.strip():
-            print("Query cannot be empty. Please try again.")
-            continue
+            if not user_query.strip():
+                print("Query cannot be empty. Please try again.")
+                continue
 
-        print(f"\n▶  Processing query: '{user_query}'")
-        print("-" * 40)
+            print(f"\n▶  Processing query: '{user_query}'")
+            print("-" * 40)
 
-        result = await system.query_with_rag(query=user_query, num_search_results=6)
+            result = await system.query_with_rag(query=user_query, num_search_results=6)
         
-        if result.get('error'):
-            print(f" Error: {result['error']}")
-            continue
+            if result.get('error'):
+                print(f" Error: {result['error']}")
+                continue
 
-        rag_result = result['rag_result']
-        scraped_contents = result['scraped_contents']
+            rag_result = result['rag_result']
+            scraped_contents = result['scraped_contents']
 
-        print(f" Pipeline completed in: {result['total_processing_time']:.2f}s")
-        print(f"   Scraped sites: {len([c for c in scraped_contents if c.success])}/{len(scraped_contents)}")
-        print(f"   Retrieved chunks: {len(rag_result.relevant_chunks)}")
-        print(f"   Confidence score: {rag_result.confidence_score:.3f}")
+            print(f" Pipeline completed in: {result['total_processing_time']:.2f}s")
+            print(f"   Scraped sites: {len([c for c in scraped_contents if c.success])}/{len(scraped_contents)}")
+            print(f"   Retrieved chunks: {len(rag_result.relevant_chunks)}")
+            print(f"   Confidence score: {rag_result.confidence_score:.3f}")
         
-        sources = rag_result.sources
-        print(f"   Sources ({len(sources)}):")
-        for src in sources[:3]:
-            print(f"     - {src}")
+            sources = rag_result.sources
+            print(f"   Sources ({len(sources)}):")
+            for src in sources[:3]:
+                print(f"     - {src}")
         
-        if rag_result.relevant_chunks:
-            print(f"   Top similarity scores:")
-            for i, chunk in enumerate(rag_result.relevant_chunks[:3]):
-                score = chunk.metadata.get('similarity_score', 0)
-                source = urlparse(chunk.source_url).netloc
-                print(f"     {i+1}. {score:.3f} from {source}")
+            if rag_result.relevant_chunks:
+                print(f"   Top similarity scores:")
+                for i, chunk in enumerate(rag_result.relevant_chunks[:3]):
+                    score = chunk.metadata.get('similarity_score', 0)
+                    source = urlparse(chunk.source_url).netloc
+                    print(f"     {i+1}. {score:.3f} from {source}")
         
-        print(f"\n   Response Preview: {rag_result.generated_response[:300]}...\n")
+            print(f"\n   Response Preview: {rag_result.generated_response[:300]}...\n")
+    finally:
+        # Statistics read the cache databases, so collect them before close() shuts those down
+        try:
+            stats = system._get_statistics()
+        finally:
+            await system.close()
 
-    stats = system._get_statistics()
     print("\n" + "="*50)
     print("   Final System Statistics:")
     print(f"   Total chunks in index: {stats['total_chunks']}")
     print(f"   Unique sources indexed: {stats['unique_sources']}")
     print(f"   Embeddings enabled: {stats['embeddings_enabled']}")
     print(f"   Avg chunk size: {stats['avg_chunk_size']:.0f} words")
+    if stats['search_cache']:
+        cache_stats = stats['search_cache']
+        print(f"   Search cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%})")
+    if stats['embedding_cache']:
+        embedding_stats = stats['embedding_cache']
+        print(f"   Embedding cache: {embedding_stats['hits']} hits / {embedding_stats['misses']} misses ({embedding_stats['hit_rate']:.0%})")
     print("="*50)
 
 if __name__ == "__main__":
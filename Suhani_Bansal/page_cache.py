@@ -0,0 +1,162 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from url_utils import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CachedPage:
+    """A cached page: validators, freshness and the extraction result stored next to the body"""
+    url: str
+    body_hash: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    fresh_until: float
+    size: int
+    extracted: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() < self.fresh_until
+
+class PageCache:
+    """Content-addressed on-disk cache of scraped pages.
+
+    Bodies are gzip-compressed under objects/<sha256>.gz, so identical pages served from different
+    URLs are stored once. A SQLite index maps canonical URLs to body hashes, HTTP validators
+    (ETag / Last-Modified) and the extracted title/text. Entries are fresh for a per-domain
+    window, then revalidated with a conditional GET; least recently used entries are evicted
+    when the stored bodies exceed max_bytes."""
+    def __init__(self, cache_dir: str, max_bytes: int = 500 * 1024 * 1024, default_freshness: float = 3600,
+                 domain_freshness: Optional[Dict[str, float]] = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.default_freshness = default_freshness
+        self.domain_freshness = domain_freshness or {}
+        self.stats_counters = {"fresh_hits": 0, "revalidated": 0, "unchanged_bodies": 0, "misses": 0, "stored": 0, "evicted": 0}
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        # Writes happen from worker threads (see scraper), so share one connection behind a lock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite3"), check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS pages (
+            url_key TEXT PRIMARY KEY, url TEXT, body_hash TEXT, etag TEXT, last_modified TEXT,
+            fetched_at REAL, last_access REAL, size INTEGER, extracted TEXT)""")
+        self._db.commit()
+
+    def freshness_for(self, url: str) -> float:
+        host = (urlparse(url).hostname or "").lower()
+        for domain, seconds in self.domain_freshness.items():
+            if host == domain or host.endswith("." + domain): return seconds
+        return self.default_freshness
+
+    def _object_path(self, body_hash: str) -> str:
+        return os.path.join(self.cache_dir, "objects", f"{body_hash}.gz")
+
+    @staticmethod
+    def body_hash(body: str) -> str:
+        return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+    def lookup(self, url: str) -> Optional[CachedPage]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, body_hash, etag, last_modified, fetched_at, size, extracted FROM pages WHERE url_key = ?",
+                (canonicalize_url(url),)).fetchone()
+        if row is None:
+            self.stats_counters["misses"] += 1
+            return None
+        page = CachedPage(url=row[0], body_hash=row[1], etag=row[2], last_modified=row[3], fetched_at=row[4],
+                          fresh_until=row[4] + self.freshness_for(row[0]), size=row[5], extracted=json.loads(row[6]))
+        if page.is_fresh: self.stats_counters["fresh_hits"] += 1
+        return page
+
+    @staticmethod
+    def conditional_headers(page: CachedPage) -> Dict[str, str]:
+        headers = {}
+        if page.etag: headers["If-None-Match"] = page.etag
+        if page.last_modified: headers["If-Modified-Since"] = page.last_modified
+        return headers
+
+    def load_body(self, page: CachedPage) -> Optional[str]:
+        try:
+            with gzip.open(self._object_path(page.body_hash), "rt", encoding="utf-8") as f: return f.read()
+        except OSError:
+            return None
+
+    def mark_revalidated(self, url: str, unchanged_body: bool = False):
+        """Record a 304 (or an identical 200 body): the cached copy is fresh again"""
+        self.stats_counters["unchanged_bodies" if unchanged_body else "revalidated"] += 1
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE pages SET fetched_at = ?, last_access = ? WHERE url_key = ?", (now, now, canonicalize_url(url)))
+            self._db.commit()
+
+    def store(self, url: str, body: str, etag: Optional[str], last_modified: Optional[str], extracted: Dict[str, Any]):
+        body_hash = self.body_hash(body)
+        path = self._object_path(body_hash)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f: f.write(body)
+            os.replace(tmp_path, path)
+        size, now = os.path.getsize(path), time.time()
+        with self._lock:
+            old = self._db.execute("SELECT body_hash FROM pages WHERE url_key = ?", (canonicalize_url(url),)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages (url_key, url, body_hash, etag, last_modified, fetched_at, last_access, size, extracted) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (canonicalize_url(url), url, body_hash, etag, last_modified, now, now, size, json.dumps(extracted)))
+            self._db.commit()
+            if old and old[0] != body_hash: self._drop_object_if_unused(old[0])
+        self.stats_counters["stored"] += 1
+        self.evict()
+
+    def _drop_object_if_unused(self, body_hash: str):
+        if self._db.execute("SELECT 1 FROM pages WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone() is None:
+            try:
+                os.remove(self._object_path(body_hash))
+            except OSError:
+                pass
+
+    def total_bytes(self) -> int:
+        """Bytes on disk; a body shared by several URLs is counted once"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM pages GROUP BY body_hash)").fetchone()
+        return row[0]
+
+    def evict(self):
+        """Drop least recently used entries until the stored bodies fit in max_bytes"""
+        total = self.total_bytes()
+        if total <= self.max_bytes: return
+        with self._lock:
+            for url_key, body_hash, size in self._db.execute("SELECT url_key, body_hash, size FROM pages ORDER BY last_access").fetchall():
+                if total <= self.max_bytes: break
+                self._db.execute("DELETE FROM pages WHERE url_key = ?", (url_key,))
+                self.stats_counters["evicted"] += 1
+                if self._db.execute("SELECT 1 FROM pages WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone() is None:
+                    self._drop_object_if_unused(body_hash)
+                    total -= size
+            self._db.commit()
+        logger.info(f"Page cache evicted down to {total} bytes (budget {self.max_bytes}).")
+
+    def stats(self) -> dict:
+        if self._db is None: return dict(self.stats_counters)  # closed: only the in-memory counters are left
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        return {**self.stats_counters, "entries": entries, "bytes": self.total_bytes()}
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
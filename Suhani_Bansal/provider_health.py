@@ -0,0 +1,115 @@
+import time
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class ProviderHealth:
+    """EWMA latency / error tracking with a circuit breaker for one search provider.
+
+    closed -> open when the error rate (or a latency overrun) crosses the threshold; after
+    open_duration seconds a single half-open probe is let through, which closes or re-opens it."""
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, alpha: float = 0.3, failure_threshold: float = 0.5, min_requests: int = 3,
+                 open_duration: float = 30.0, slow_latency: Optional[float] = None):
+        self.name = name
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.min_requests = min_requests
+        self.open_duration = open_duration
+        self.slow_latency = slow_latency
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.requests = self.failures = self.skipped = 0
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        if self.state == self.CLOSED: return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.open_duration:
+            logger.info(f"Circuit for {self.name} half-open, sending probe.")
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        self.skipped += 1
+        return False
+
+    def _open(self):
+        if self.state != self.OPEN:
+            logger.warning(f"Circuit for {self.name} opened (error rate {self.error_ewma:.2f}, latency {self.latency_ewma or 0:.2f}s).")
+        self.state, self.opened_at = self.OPEN, time.monotonic()
+
+    def record(self, success: bool, latency: float):
+        self.requests += 1
+        self.probe_in_flight = False
+        if self.slow_latency is not None and latency > self.slow_latency: success = False
+        if not success: self.failures += 1
+        self.latency_ewma = latency if self.latency_ewma is None else self.alpha * latency + (1 - self.alpha) * self.latency_ewma
+        self.error_ewma = self.alpha * (0.0 if success else 1.0) + (1 - self.alpha) * self.error_ewma
+
+        if self.state == self.HALF_OPEN:
+            if success:
+                logger.info(f"Circuit for {self.name} closed after successful probe.")
+                self.state, self.error_ewma = self.CLOSED, 0.0
+            else:
+                self._open()
+        elif self.requests >= self.min_requests and self.error_ewma >= self.failure_threshold:
+            self._open()
+
+    def release(self):
+        """Call when a request was cancelled before producing an outcome"""
+        self.probe_in_flight = False
+
+    @property
+    def score(self) -> float:
+        """Expected cost of a call; lower is healthier. Unknown providers rank first so they get measured."""
+        if self.latency_ewma is None: return 0.0
+        return self.latency_ewma * (1.0 + 4.0 * self.error_ewma)
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state, "latency_ewma": self.latency_ewma, "error_rate_ewma": self.error_ewma,
+            "requests": self.requests, "failures": self.failures, "skipped": self.skipped, "score": self.score}
+
+class ProviderHealthTracker:
+    """Health state for a set of providers, used to order and skip agents"""
+    def __init__(self, **health_kwargs):
+        self.health_kwargs = health_kwargs
+        self.providers: Dict[str, ProviderHealth] = {}
+
+    def get(self, name: str) -> ProviderHealth:
+        if name not in self.providers:
+            self.providers[name] = ProviderHealth(name, **self.health_kwargs)
+        return self.providers[name]
+
+    def rank(self, agents: List) -> List:
+        """Agents ordered by circuit state (closed, half-open, open), then mostly-failing after the rest, then by score.
+        A provider that fails fast has a low score, so the score alone would rank it above a slow one that works."""
+        state_order = {ProviderHealth.CLOSED: 0, ProviderHealth.HALF_OPEN: 1, ProviderHealth.OPEN: 2}
+        def key(agent):
+            health = self.get(agent.source)
+            return state_order[health.state], health.error_ewma >= health.failure_threshold, health.score
+        return sorted(agents, key=key)
+
+    def select(self, agents: List) -> List:
+        """Agents whose circuit allows a request, healthiest first. If every circuit is open,
+        the single best-ranked agent is still returned so queries are never left with no provider."""
+        ranked = self.rank(agents)
+        allowed = [agent for agent in ranked if self.get(agent.source).allow_request()]
+        if not allowed and ranked:
+            logger.warning(f"All provider circuits open, falling back to {ranked[0].source}.")
+            allowed = ranked[:1]
+        return allowed
+
+    def admit(self, agent, agents: List) -> bool:
+        """Per-call form of select() for when the call is about to start: whether agent may be called now.
+        With no circuit closed, the best-ranked agent of agents is still let through."""
+        if self.get(agent.source).allow_request(): return True
+        if any(self.get(other.source).state == ProviderHealth.CLOSED for other in agents): return False
+        return self.rank(agents)[0] is agent
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {name: health.snapshot() for name, health in self.providers.items()}
@@ -1,10 +1,17 @@
+import asyncio
 import numpy as np
 import re
 import time
 import logging
-from typing import List
+from typing import List, Optional
 
 from data_models import ScrapedContent, DocumentChunk, RAGResult
+from dedup import NearDuplicateFilter
+from embedding_cache import EmbeddingCache
+from deadline import Deadline
+from keyword_index import BM25Index
+from ranking import FUSION_METHODS, reciprocal_rank_fusion, top_k_ids, weighted_fusion
+from vector_index import VectorIndex
 
 try:
     from sentence_transformers import SentenceTransformer
@@ -17,17 +24,41 @@ logger = logging.getLogger(__name__)
 
 class ImprovedRAGAgent:
     """RAG agent for chunking, indexing, and querying content."""
-    def __init__(self, chunk_size: int = 512, chunk_overlap: int = 64, use_embeddings: bool = True):
+    # Chunks encoded per step; the deadline is checked between steps
+    ENCODE_BATCH_SIZE = 64
+    EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+    def __init__(self, chunk_size: int = 512, chunk_overlap: int = 64, use_embeddings: bool = True, dedup: bool = True, dedup_max_hamming: int = 3,
+                 index_config: Optional[dict] = None, bm25_k1: float = 1.5, bm25_b: float = 0.75,
+                 fusion: str = "weighted", dense_weight: float = 0.7, rrf_k: int = 60, hybrid_candidates: int = 3,
+                 embedding_cache_dir: Optional[str] = None, embedding_cache_max_bytes: int = 256 * 1024 * 1024):
+        if fusion not in FUSION_METHODS: raise ValueError(f"Unknown fusion '{fusion}', expected one of {FUSION_METHODS}")
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.document_chunks: List[DocumentChunk] = []
         self.use_embeddings = use_embeddings and EMBEDDINGS_AVAILABLE
+        # Mirrors and syndicated copies are merged before chunking/embedding instead of indexed again
+        self.dedup = NearDuplicateFilter(max_hamming=dedup_max_hamming) if dedup else None
+        # Micro-batches may be indexed while other pipeline work runs; keep chunk list and index in step
+        self._index_lock = asyncio.Lock()
+        # Normalised embeddings, row i belonging to document_chunks[i]; flat while small, approximate (HNSW/IVF) once large
+        self.index_config = index_config or {}
+        self.index = VectorIndex(**self.index_config)
+        # Inverted index over chunk text, document i = document_chunks[i]; updated alongside the vector index
+        self.keyword_index = BM25Index(k1=bm25_k1, b=bm25_b)
+        self.fusion = fusion
+        self.dense_weight = dense_weight
+        self.rrf_k = rrf_k
+        self.hybrid_candidates = hybrid_candidates
         
+        self.embedding_cache = None
         if self.use_embeddings:
-            self.model = SentenceTransformer('all-MiniLM-L6-v2')
-            self.index = None
-            self.embeddings = None
+            self.model = SentenceTransformer(self.EMBEDDING_MODEL)
             logger.info("SentenceTransformer model loaded for embeddings.")
+            if embedding_cache_dir:
+                # Chunk text seen before (re-scraped pages, earlier runs) is not encoded again
+                self.embedding_cache = EmbeddingCache(embedding_cache_dir, self.EMBEDDING_MODEL,
+                                                      self.model.get_sentence_embedding_dimension(), max_bytes=embedding_cache_max_bytes)
         else:
             self.model = None
             if use_embeddings and not EMBEDDINGS_AVAILABLE:
@@ -52,38 +83,142 @@ class ImprovedRAGAgent:
                 metadata={"word_count": len(chunk_words)}))
         return chunks
 
-    async def index_documents(self, documents: List[ScrapedContent]):
+    @property
+    def embeddings(self) -> Optional[np.ndarray]:
+        """L2-normalised chunk embeddings (a view of the buffer), or None before anything is embedded"""
+        return self.index.vectors if len(self.index) else None
+
+    def _add_embeddings(self, vectors: np.ndarray):
+        """Normalise only the new vectors and append them to the live index"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        self.index.add(vectors)
+
+    def load_embeddings(self, embeddings: np.ndarray):
+        """Replace the index with saved embeddings (one row per entry in document_chunks)"""
+        self.index.close()
+        self.index = VectorIndex(**self.index_config)
+        self._add_embeddings(embeddings)
+
+    def load_chunks(self, chunks: List[DocumentChunk]):
+        """Replace the indexed chunks (e.g. from a saved index) and rebuild the keyword index over them"""
+        self.document_chunks = chunks
+        self.keyword_index.clear()
+        self.keyword_index.add(chunk.content for chunk in chunks)
+
+    def _encode_chunks(self, texts: List[str]) -> np.ndarray:
+        """Encode chunk texts, reading previously embedded ones from the embedding cache (blocking; run in a thread)"""
+        encode = lambda batch: self.model.encode(batch, show_progress_bar=False, convert_to_numpy=True)
+        return self.embedding_cache.encode(texts, encode) if self.embedding_cache else encode(texts)
+
+    def close(self):
+        """Stop the index build thread and close the embedding cache"""
+        self.index.close()
+        if self.embedding_cache: self.embedding_cache.close()
+
+    def _num_chunks(self, text: str) -> int:
+        return len(range(0, len(text.split()), self.chunk_size - self.chunk_overlap))
+
+    async def index_documents(self, documents: List[ScrapedContent], deadline: Optional[Deadline] = None):
+        """Chunk, deduplicate and embed documents. If the deadline passes mid-way, the chunks encoded so
+        far are indexed and the rest are dropped."""
         logger.info(f"Indexing {len(documents)} new documents.")
-        new_chunks = []
-        for doc in documents:
-            if doc.success and doc.content and len(doc.content.strip()) > 100:
+        deadline = deadline or Deadline()
+        async with self._index_lock:
+            documents = [doc for doc in documents if doc.success and doc.content and len(doc.content.strip()) > 100]
+            if self.dedup: documents = self.dedup.filter_documents(documents, chunk_count=self._num_chunks)
+            new_chunks = []
+            for doc in documents:
                 chunks = self._chunk_text(doc.content, doc.url)
+                if self.dedup:
+                    # Whole-page duplicates contain every chunk, so chunks reference the page's list (pages merged
+                    # later show up too); chunk-level merges go to each chunk's own duplicate_sources list
+                    for chunk in chunks: chunk.metadata["page_duplicate_sources"] = doc.metadata["duplicate_sources"]
                 new_chunks.extend(chunks)
-        
-        self.document_chunks.extend(new_chunks)
-        logger.info(f"Created {len(new_chunks)} new chunks. Total chunks in index: {len(self.document_chunks)}")
-
-        if self.use_embeddings and self.model and new_chunks:
-            logger.info(f"Generating embeddings for {len(new_chunks)} new chunks and rebuilding FAISS index...")
-            texts = [chunk.content for chunk in new_chunks]
-            new_embeddings = self.model.encode(texts, show_progress_bar=False, convert_to_numpy=True)
-            
-            if self.embeddings is None: self.embeddings = new_embeddings
-            else: self.embeddings = np.vstack([self.embeddings, new_embeddings])
-
-            dimension = self.embeddings.shape[1]
-            self.index = faiss.IndexFlatIP(dimension)
-            normalized_embeddings = self.embeddings.copy()
-            faiss.normalize_L2(normalized_embeddings)
-            self.index.add(normalized_embeddings.astype('float32'))
-            logger.info("FAISS index rebuild complete.")
-
-    def _calculate_keyword_similarity(self, query: str, chunk: DocumentChunk) -> float:
-        query_words = set(self._preprocess_text(query).split())
-        chunk_words = set(chunk.content.split())
-        if not query_words: return 0.0
-        intersection, union = len(query_words.intersection(chunk_words)), len(query_words.union(chunk_words))
-        return intersection / union if union > 0 else 0.0
+            if self.dedup: new_chunks = self.dedup.filter_chunks(new_chunks)
+
+            if self.use_embeddings and self.model and new_chunks:
+                logger.info(f"Generating embeddings for {len(new_chunks)} new chunks...")
+                encoded = []
+                for start in range(0, len(new_chunks), self.ENCODE_BATCH_SIZE):
+                    if deadline.expired:
+                        logger.warning(f"Deadline reached after encoding {start}/{len(new_chunks)} chunks; dropping the rest.")
+                        break
+                    texts = [chunk.content for chunk in new_chunks[start:start + self.ENCODE_BATCH_SIZE]]
+                    # Encoding runs in a worker thread so downloads on the event loop keep flowing
+                    encoded.append(await asyncio.to_thread(self._encode_chunks, texts))
+                embedded = sum(len(batch) for batch in encoded)
+                if self.dedup and embedded < len(new_chunks):
+                    # Roll back the fingerprints of what was dropped (and of its pages) so a later ingest picks it up
+                    dropped = new_chunks[embedded:]
+                    dropped_urls = {chunk.source_url for chunk in dropped}
+                    self.dedup.forget(dropped, [doc for doc in documents if doc.url in dropped_urls])
+                new_chunks = new_chunks[:embedded]
+
+            if self.use_embeddings and self.model and new_chunks:
+                # Only the new rows are touched: ingest cost no longer grows with the size of the index
+                self._add_embeddings(np.vstack(encoded))
+                logger.info(f"Added {len(new_chunks)} vectors to the {self.index.active_kind} index ({len(self.index)} total).")
+
+            self.keyword_index.add(chunk.content for chunk in new_chunks)
+            self.document_chunks.extend(new_chunks)
+            logger.info(f"Created {len(new_chunks)} new chunks. Total chunks in index: {len(self.document_chunks)}")
+
+    def _query_coverage(self, query_terms: set, text: str) -> float:
+        """Fraction of query terms present in text: the lexical stand-in for cosine similarity"""
+        return len(query_terms.intersection(self._preprocess_text(text).split())) / len(query_terms) if query_terms else 0.0
+
+    async def score_texts(self, query: str, texts: List[str]) -> np.ndarray:
+        """Relevance of each text to the query, encoding the query and all texts in one batch.
+        Cosine similarity with embeddings, query-term coverage without."""
+        if not texts: return np.zeros(0)
+        if self.use_embeddings and self.model:
+            vectors = await asyncio.to_thread(
+                self.model.encode, [self._preprocess_text(query)] + [self._preprocess_text(t) for t in texts],
+                show_progress_bar=False, convert_to_numpy=True, normalize_embeddings=True)
+            return vectors[1:] @ vectors[0]
+        query_terms = set(self._preprocess_text(query).split())
+        return np.array([self._query_coverage(query_terms, t) for t in texts])
+
+    async def count_confident_chunks(self, query: str, min_score: float, limit: int = 64) -> int:
+        """How many indexed chunks (up to limit) score at least min_score against the query"""
+        if not self.document_chunks: return 0
+        if self.use_embeddings and self.index:
+            query_embedding = await asyncio.to_thread(self.model.encode, [self._preprocess_text(query)], show_progress_bar=False, convert_to_numpy=True)
+            faiss.normalize_L2(query_embedding)
+            scores, ids = self.index.search(query_embedding.astype('float32'), min(limit, len(self.document_chunks)))
+            return int(((scores[0] >= min_score) & (ids[0] >= 0)).sum())
+        query_terms = set(self._preprocess_text(query).split())
+        return min(limit, sum(self._query_coverage(query_terms, c.content) >= min_score for c in self.document_chunks))
+
+    @staticmethod
+    def _sources(chunks: List[DocumentChunk]) -> List[str]:
+        """Chunk URLs plus the URLs of near-duplicate copies merged into them"""
+        sources = {c.source_url for c in chunks}
+        for chunk in chunks:
+            sources.update(chunk.metadata.get("duplicate_sources", ()))
+            sources.update(chunk.metadata.get("page_duplicate_sources", ()))
+        return list(sources)
+
+    def _hybrid_search(self, query: str, query_embedding: np.ndarray, top_k: int):
+        """Dense and BM25 retrieval run independently over the whole index, then fused in one vectorized step.
+        Returns (ids, fused, dense, keyword) score arrays for the top_k chunks, best first."""
+        depth = min(top_k * self.hybrid_candidates, len(self.document_chunks))
+        _, dense_ids = self.index.search(query_embedding, depth)
+        dense_ids = dense_ids[0][dense_ids[0] >= 0]  # approximate indexes may return fewer than depth hits
+        all_keyword_scores = self.keyword_index.scores(query)
+        keyword_ids = top_k_ids(all_keyword_scores, depth, positive_only=True)
+
+        candidates = np.union1d(dense_ids, keyword_ids)
+        # Exact cosine for every candidate, including keyword-only hits the vector index did not return
+        dense_scores = self.index.vectors[candidates] @ query_embedding[0]
+        keyword_scores = all_keyword_scores[candidates]
+        if self.fusion == "rrf":
+            fused = reciprocal_rank_fusion(candidates, [dense_ids, keyword_ids], [self.dense_weight, 1 - self.dense_weight], k=self.rrf_k)
+        else:
+            fused = weighted_fusion(dense_scores, keyword_scores, self.dense_weight)
+        order = top_k_ids(fused, top_k)
+        return candidates[order], fused[order], dense_scores[order], keyword_scores[order]
 
     async def query(self, query: str, top_k: int = 5) -> RAGResult:
         logger.info(f"Performing RAG query for: '{query}'")
@@ -95,31 +230,24 @@ class ImprovedRAGAgent:
             return RAGResult(query, [], "No indexed documents available.", 0.0, [], 0, 0)
 
         if self.use_embeddings and self.index:
-            logger.info("Using embedding-based search with keyword re-ranking.")
-            query_embedding = self.model.encode([self._preprocess_text(query)])
+            logger.info(f"Using hybrid dense + BM25 search ({self.fusion} fusion).")
+            query_embedding = self.model.encode([self._preprocess_text(query)]).astype('float32')
             faiss.normalize_L2(query_embedding)
-            k_search = min(top_k * 3, len(self.document_chunks))
-            scores, indices = self.index.search(query_embedding.astype('float32'), k_search)
-            
-            candidate_chunks = []
-            for score, idx in zip(scores[0], indices[0]):
+            ids, fused, dense, keyword = self._hybrid_search(query, query_embedding, top_k)
+            # similarity_score stays the weighted relevance in [0, 1] (used for confidence); RRF only decides the order
+            relevance = weighted_fusion(dense, keyword, self.dense_weight)
+            for i, idx in enumerate(ids):
                 chunk = self.document_chunks[idx]
-                keyword_score = self._calculate_keyword_similarity(query, chunk)
-                combined_score = 0.7 * float(score) + 0.3 * keyword_score
-                chunk.metadata['similarity_score'] = combined_score
-                candidate_chunks.append((combined_score, chunk))
-            candidate_chunks.sort(reverse=True, key=lambda x: x[0])
-            relevant_chunks = [chunk for _, chunk in candidate_chunks[:top_k]]
+                chunk.metadata.update(similarity_score=float(relevance[i]), fusion_score=float(fused[i]),
+                                      dense_score=float(dense[i]), keyword_score=float(keyword[i]))
+                relevant_chunks.append(chunk)
         else:
-            logger.info("Using keyword-based search.")
-            scored_chunks = []
-            for chunk in self.document_chunks:
-                score = self._calculate_keyword_similarity(query, chunk)
-                if score > 0:
-                    chunk.metadata['similarity_score'] = score
-                    scored_chunks.append((score, chunk))
-            scored_chunks.sort(reverse=True, key=lambda x: x[0])
-            relevant_chunks = [chunk for _, chunk in scored_chunks[:top_k]]
+            logger.info("Using BM25 keyword search.")
+            scores, indices = self.keyword_index.top_k(query, top_k)
+            for score, idx in zip(scores, indices):
+                chunk = self.document_chunks[idx]
+                chunk.metadata['similarity_score'] = float(score)
+                relevant_chunks.append(chunk)
         
         retrieval_time = time.time() - start_time
         logger.info(f"Retrieved {len(relevant_chunks)} relevant chunks in {retrieval_time:.2f}s.")
@@ -137,5 +265,5 @@ class ImprovedRAGAgent:
         
         return RAGResult(
             query=query, relevant_chunks=relevant_chunks, generated_response=response,
-            confidence_score=confidence, sources=list(set(c.source_url for c in relevant_chunks)),
+            confidence_score=confidence, sources=self._sources(relevant_chunks),
             retrieval_time=retrieval_time, generation_time=time.time() - generation_start)
\ No newline at end of file
@@ -0,0 +1,25 @@
+"""Vectorized ranking helpers: top-k selection and fusion of dense and keyword result lists."""
+from typing import Sequence
+
+import numpy as np
+
+FUSION_METHODS = ("weighted", "rrf")
+
+def top_k_ids(scores: np.ndarray, k: int, positive_only: bool = False) -> np.ndarray:
+    """Ids of the k highest scores, best first, via argpartition instead of a full sort"""
+    candidates = np.flatnonzero(scores > 0) if positive_only else np.arange(len(scores))
+    if len(candidates) > k: candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+def weighted_fusion(dense_scores: np.ndarray, keyword_scores: np.ndarray, dense_weight: float) -> np.ndarray:
+    """Convex combination of cosine similarity and normalised BM25, both in [0, 1]"""
+    return dense_weight * dense_scores + (1 - dense_weight) * keyword_scores
+
+def reciprocal_rank_fusion(candidates: np.ndarray, rankings: Sequence[np.ndarray], weights: Sequence[float], k: int = 60) -> np.ndarray:
+    """Weighted RRF score for each of the sorted, unique candidate ids: sum of weight / (k + rank)
+    over the rankings (id arrays, best first) that contain it. Only ranks matter, not score scales."""
+    fused = np.zeros(len(candidates))
+    for ranking, weight in zip(rankings, weights):
+        if len(ranking) == 0: continue
+        fused[np.searchsorted(candidates, ranking)] += weight / (k + np.arange(1, len(ranking) + 1))
+    return fused
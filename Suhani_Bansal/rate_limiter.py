@@ -0,0 +1,81 @@
+import asyncio
+import time
+import logging
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, holding at most `burst` tokens"""
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0: raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def retune(self, rate: float, burst: int = 1):
+        """Change rate/burst, keeping the tokens already accrued (capped at the new burst)"""
+        if rate <= 0: raise ValueError("rate must be positive")
+        self._refill()
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = min(self.tokens, self.burst)
+
+    async def acquire(self) -> float:
+        """Take one token, sleeping until one is available. Returns the time spent waiting."""
+        waited = 0.0
+        # Waiters queue on the lock, so tokens are handed out in FIFO order
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                delay = (1 - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self.tokens -= 1
+        return waited
+
+class HostRateLimiter:
+    """Token buckets keyed by host (or provider name), created on first use"""
+    def __init__(self, default_rate: float = 1.0, default_burst: int = 1, limits: Optional[Dict[str, Tuple[float, int]]] = None):
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.limits: Dict[str, Tuple[float, int]] = dict(limits or {})
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    @staticmethod
+    def key_for_url(url: str) -> str:
+        return urlparse(url).netloc.lower()
+
+    def configure(self, key: str, rate: float, burst: int = 1):
+        """Set the rate/burst for a key. The same values again are a no-op, so the bucket keeps its
+        pacing state; different values retune the existing bucket rather than replacing it with a full one."""
+        if self.limits.get(key) == (rate, burst): return
+        if key in self.limits: logger.info(f"Rate limit for '{key}' changed from {self.limits[key]} to {(rate, burst)}")
+        self.limits[key] = (rate, burst)
+        bucket = self._buckets.get(key)
+        if bucket is not None: bucket.retune(rate, burst)
+
+    def _bucket(self, key: str) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate, burst = self.limits.get(key, (self.default_rate, self.default_burst))
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    async def acquire(self, key: str) -> float:
+        waited = await self._bucket(key).acquire()
+        if waited > 0:
+            logger.debug(f"Rate limited '{key}' for {waited:.2f}s")
+        return waited
+
+    async def acquire_url(self, url: str) -> float:
+        return await self.acquire(self.key_for_url(url))
@@ -1,102 +1,291 @@
 import asyncio
 import aiohttp
-import re
-import time
+import codecs
 import logging
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import List
+from functools import partial
+from typing import AsyncIterable, AsyncIterator, Iterable, List, Optional, Sequence, Union
 
+from concurrency_limiter import AdaptiveConcurrencyLimiter
 from data_models import ScrapedContent
-
-try:
-    from bs4 import BeautifulSoup
-    import trafilatura
-    SCRAPING_AVAILABLE = True
-except ImportError:
-    SCRAPING_AVAILABLE = False
+from deadline import Deadline
+from extraction import SCRAPING_AVAILABLE, extract_content
+from page_cache import CachedPage, PageCache
+from rate_limiter import HostRateLimiter
+from single_flight import SingleFlight
+from url_utils import canonicalize_url
 
 logger = logging.getLogger(__name__)
 
+_META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_\-:.]+)', re.IGNORECASE)
+_BOMS = ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+
+class PageRejected(Exception):
+    """Raised when a response is skipped without retrying (unsupported type or over the size limit)"""
+    pass
+
+def _sniff_charset(head: bytes) -> Optional[str]:
+    """Charset from a byte-order mark or <meta charset> / http-equiv tag at the start of the document"""
+    for bom, encoding in _BOMS:
+        if head.startswith(bom): return encoding
+    match = _META_CHARSET.search(head)
+    return match.group(1).decode("ascii", "ignore") if match else None
+
+def _valid_codec(name: Optional[str]) -> Optional[str]:
+    if not name: return None
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
 class WebScraperAgent:
     """web scraper with content extraction"""
-    def __init__(self, max_retries: int = 3, timeout: int = 30, rate_limit_delay: float = 1.0):
+    # A retry is only attempted if the deadline leaves this long after the backoff sleep
+    MIN_ATTEMPT_SECONDS = 1.0
+
+    def __init__(self, max_retries: int = 3, timeout: int = 30, rate_limit_delay: float = 1.0, rate_limiter: Optional[HostRateLimiter] = None,
+                 extraction_workers: int = 0, extraction_backends: Sequence[str] = ("trafilatura", "lxml"),
+                 max_body_bytes: int = 5 * 1024 * 1024, allowed_content_types: Sequence[str] = ("text/html", "application/xhtml+xml", "text/plain"),
+                 page_cache: Optional[PageCache] = None, concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None):
         self.max_retries = max_retries
         self.timeout = timeout
         self.rate_limit_delay = rate_limit_delay
+        # Per-host buckets: each site is paced politely while different sites scrape in parallel
+        self.rate_limiter = rate_limiter or HostRateLimiter(default_rate=1.0 / rate_limit_delay if rate_limit_delay > 0 else 1000.0)
         self.session = None
-        self.last_request_time = 0
+        self.inflight = SingleFlight()
+        # 0 extracts inline on the event loop; >0 uses a process pool of that size
+        self.extraction_workers = extraction_workers
+        self.extraction_backends = tuple(extraction_backends)
+        self.max_body_bytes = max_body_bytes
+        self.allowed_content_types = set(allowed_content_types)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._extraction_slots: Optional[asyncio.Semaphore] = None
+        self.page_cache = page_cache
+        # Requests in flight are capped per host and globally by AIMD limits that react to timeouts/429/5xx
+        self.concurrency = concurrency_limiter or AdaptiveConcurrencyLimiter()
+        if not SCRAPING_AVAILABLE: logger.error("lxml is not installed; only pages already in the page cache can be served.")
         logger.info(f"WebScraperAgent initialized with max_retries={max_retries}, timeout={timeout}s")
 
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=self.timeout),
-            headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'})
+        self._ensure_session()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _ensure_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'})
+
+    async def close(self):
         if self.session:
             await self.session.close()
+            self.session = None
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _rate_limit(self, url: str):
+        await self.rate_limiter.acquire_url(url)
+
+    async def _read_body(self, response: aiohttp.ClientResponse) -> str:
+        """Stream the body up to max_body_bytes and decode it using the HTTP or <meta> charset,
+        rejecting unsupported content types and oversized pages before buffering them"""
+        if 'Content-Type' in response.headers and response.content_type not in self.allowed_content_types:
+            raise PageRejected(f"Unsupported content type {response.content_type}")
+        if response.content_length is not None and response.content_length > self.max_body_bytes:
+            raise PageRejected(f"Content-Length {response.content_length} exceeds {self.max_body_bytes} bytes")
+
+        chunks, size = [], 0
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            size += len(chunk)
+            if size > self.max_body_bytes:
+                raise PageRejected(f"Body exceeds {self.max_body_bytes} bytes")
+            chunks.append(chunk)
+        body = b"".join(chunks)
+
+        encoding = _valid_codec(response.charset) or _valid_codec(_sniff_charset(body[:4096])) or "utf-8"
+        return body.decode(encoding, errors="replace")
+
+    async def _extract(self, html: str, url: str = "") -> dict:
+        """Run CPU-bound extraction in the process pool so parsing never blocks the event loop"""
+        extract = partial(extract_content, url=url, backends=self.extraction_backends)
+        if self.extraction_workers <= 0:
+            return extract(html)
+        if self._executor is None:
+            # Spawned, not forked: by now the process runs threads (torch, faiss, asyncio.to_thread workers),
+            # and forking a multi-threaded process can deadlock the child on a lock held by another thread
+            self._executor = ProcessPoolExecutor(max_workers=self.extraction_workers, mp_context=multiprocessing.get_context("spawn"))
+            self._extraction_slots = asyncio.Semaphore(self.extraction_workers * 2)
+        # Bound queued pages so a burst of downloads cannot pile up unparsed HTML in memory
+        async with self._extraction_slots:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, extract, html)
 
-    async def _rate_limit(self):
-        now = time.time()
-        time_since_last = now - self.last_request_time
-        if time_since_last < self.rate_limit_delay:
-            delay = self.rate_limit_delay - time_since_last
-            logger.debug(f"Rate limiting scraper for {delay:.2f}s")
-            await asyncio.sleep(delay)
-        self.last_request_time = time.time()
-
-    def _clean_text(self, text: str) -> str:
-        text = re.sub(r'\s+', ' ', text)
-        text = re.sub(r'[^\w\s\.,!?;:()\-"]', '', text)
-        return re.sub(r' +', ' ', text).strip()
-
-    async def scrape_url(self, url: str) -> ScrapedContent:
-        await self._rate_limit()
+    async def scrape_url(self, url: str, deadline: Optional[Deadline] = None) -> ScrapedContent:
+        """Scrape a URL; concurrent requests for the same page share one download.
+        With a deadline, HTTP timeouts and retries are cut to fit the remaining time."""
+        self._ensure_session()
+        return await self.inflight.do(canonicalize_url(url), lambda: self._scrape_url(url, deadline or Deadline()))
+
+    @staticmethod
+    def _failure(url: str, error_message: str, **metadata) -> ScrapedContent:
+        return ScrapedContent(url=url, title="", content="", text_length=0, scrape_timestamp=datetime.now(),
+                              success=False, error_message=error_message, metadata=metadata)
+
+    async def _backoff(self, attempt: int, deadline: Deadline) -> bool:
+        """Sleep before the next attempt; False if none is left or the deadline cannot cover the wait plus a try"""
+        delay = 2 ** attempt
+        if attempt >= self.max_retries - 1 or not deadline.can_afford(delay + self.MIN_ATTEMPT_SECONDS): return False
+        await asyncio.sleep(delay)
+        return True
+
+    @staticmethod
+    def _from_cache(url: str, page: CachedPage, state: str) -> ScrapedContent:
+        extracted = page.extracted
+        return ScrapedContent(
+            url=url, title=extracted["title"], content=extracted["content"], text_length=len(extracted["content"]),
+            scrape_timestamp=datetime.now(), success=True,
+            metadata={**{key: extracted[key] for key in ("method", "tables", "outlinks")}, "timings": {}, "page_cache": state})
+
+    async def _scrape_url(self, url: str, deadline: Deadline) -> ScrapedContent:
+        cached = self.page_cache.lookup(url) if self.page_cache else None
+        if cached and cached.is_fresh:
+            logger.info(f"Serving {url} from page cache.")
+            return self._from_cache(url, cached, "fresh")
+        if not SCRAPING_AVAILABLE:
+            # Every download would fail extraction the same way, so don't fetch (or retry) at all
+            return self._failure(url, "lxml is not installed; cannot extract page content", rejected=True)
+        # Stale entries are revalidated: a 304 reuses the stored extraction without downloading the body
+        headers = PageCache.conditional_headers(cached) if cached else {}
+
+        try:
+            await asyncio.wait_for(self._rate_limit(url), deadline.timeout())
+        except asyncio.TimeoutError:
+            return self._failure(url, "Deadline exceeded", deadline_exceeded=True)
         logger.info(f"Scraping URL: {url}")
         error_msg = ""
         for attempt in range(self.max_retries):
+            if deadline.expired:
+                error_msg = f"{error_msg} (deadline exceeded)" if error_msg else "Deadline exceeded"
+                break
             try:
-                async with self.session.get(url, allow_redirects=True) as response:
-                    if response.status == 200:
-                        html = await response.text()
-                        if SCRAPING_AVAILABLE:
-                            logger.debug(f"Attempting extraction with Trafilatura for {url}")
-                            content = trafilatura.extract(html, include_comments=False, include_tables=True)
-                            if content:
-                                soup = BeautifulSoup(html, 'html.parser')
-                                title = soup.title.string.strip() if soup.title else "No Title"
-                                cleaned_content = self._clean_text(content)
-                                logger.info(f"Successfully extracted content from {url} using Trafilatura.")
-                                return ScrapedContent(
-                                    url=url, title=title, content=cleaned_content, text_length=len(cleaned_content),
-                                    scrape_timestamp=datetime.now(), success=True, metadata={"method": "trafilatura"})
-                        
-                        logger.debug(f"Falling back to BeautifulSoup for {url}")
-                        soup = BeautifulSoup(html, 'html.parser')
-                        title = soup.title.string.strip() if soup.title else "No Title"
-                        for element in soup(['script', 'style', 'nav', 'header', 'footer', 'aside']): element.decompose()
-                        main_content = soup.find('main') or soup.find('article') or soup.body
-                        text_content = main_content.get_text() if main_content else ""
-                        cleaned_content = self._clean_text(text_content)
-                        logger.info(f"Successfully extracted content from {url} using BeautifulSoup.")
-                        return ScrapedContent(
-                            url=url, title=title, content=cleaned_content, text_length=len(cleaned_content),
-                            scrape_timestamp=datetime.now(), success=True, metadata={"method": "beautifulsoup"})
-                    else:
-                        error_msg = f"HTTP {response.status}"
+                html = None
+                async with self.concurrency.slot(url) as slot:
+                    budget = deadline.timeout(self.timeout)
+                    # A timeout shrunk to the request deadline says nothing about the server, so it must not cut the AIMD limits
+                    slot.timeout_is_overload = budget is None or budget >= self.timeout
+                    request_timeout = aiohttp.ClientTimeout(total=max(0.1, budget))
+                    async with self.session.get(url, allow_redirects=True, headers=headers, timeout=request_timeout) as response:
+                        slot.observe_status(response.status)
+                        if response.status == 304 and cached:
+                            logger.info(f"{url} not modified, reusing cached extraction.")
+                            self.page_cache.mark_revalidated(url)
+                            return self._from_cache(url, cached, "revalidated")
+                        if response.status == 200:
+                            html = await self._read_body(response)
+                            etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+                            cacheable = "no-store" not in response.headers.get("Cache-Control", "")
+                        else:
+                            error_msg = f"HTTP {response.status}"
+                if html is None:
+                    # Back off before retrying a server that said it is overloaded
+                    if slot.overloaded and not await self._backoff(attempt, deadline): break
+                    continue
+
+                # The slot is released before parsing, so extraction time does not count as network latency
+                if cached and cached.body_hash == PageCache.body_hash(html):
+                    # Server ignored the validators but the page is byte-for-byte the same
+                    self.page_cache.mark_revalidated(url, unchanged_body=True)
+                    return self._from_cache(url, cached, "unchanged")
+                extracted = await self._extract(html, url)
+                logger.info(f"Successfully extracted content from {url} using {extracted['method']}.")
+                if self.page_cache and cacheable:
+                    await asyncio.to_thread(
+                        self.page_cache.store, url, html, etag, last_modified,
+                        {key: extracted[key] for key in ("title", "content", "method", "tables", "outlinks")})
+                return ScrapedContent(
+                    url=url, title=extracted["title"], content=extracted["content"], text_length=len(extracted["content"]),
+                    scrape_timestamp=datetime.now(), success=True,
+                    metadata={key: extracted[key] for key in ("method", "tables", "outlinks", "timings")})
+            except PageRejected as e:
+                # Wrong type or too large: retrying would download the same useless body again
+                logger.info(f"Skipping {url}: {e}")
+                return self._failure(url, str(e), rejected=True)
             except Exception as e:
-                error_msg = str(e)
-                logger.warning(f"Attempt {attempt + 1}/{self.max_retries} failed for {url}: {e}")
-                if attempt < self.max_retries - 1: await asyncio.sleep(2 ** attempt)
-
-        logger.error(f"All {self.max_retries} attempts failed for URL: {url}. Last error: {error_msg}")
-        return ScrapedContent(url=url, title="", content="", text_length=0, scrape_timestamp=datetime.now(), success=False, error_message=error_msg)
-
-    async def scrape_multiple_urls(self, urls: List[str], max_concurrent: int = 5) -> List[ScrapedContent]:
-        logger.info(f"Starting concurrent scrape for {len(urls)} URLs with max concurrency of {max_concurrent}.")
-        semaphore = asyncio.Semaphore(max_concurrent)
-        async def scrape_with_semaphore(url):
-            async with semaphore: return await self.scrape_url(url)
-        tasks = [scrape_with_semaphore(url) for url in urls]
-        return await asyncio.gather(*tasks)
\ No newline at end of file
+                error_msg = str(e) or type(e).__name__
+                logger.warning(f"Attempt {attempt + 1}/{self.max_retries} failed for {url}: {error_msg}")
+                if not await self._backoff(attempt, deadline): break
+
+        logger.error(f"Giving up on URL: {url}. Last error: {error_msg}")
+        return self._failure(url, error_msg)
+
+    def _bounded(self, max_concurrent: Optional[int]):
+        """Optional hard cap on scrapes in flight; without one the adaptive limiter alone sets concurrency"""
+        semaphore = asyncio.Semaphore(max_concurrent) if max_concurrent else None
+        async def scrape(url, deadline):
+            if semaphore is None: return await self.scrape_url(url, deadline)
+            async with semaphore: return await self.scrape_url(url, deadline)
+        return scrape
+
+    async def scrape_multiple_urls(self, urls: List[str], max_concurrent: Optional[int] = None, deadline: Optional[Deadline] = None) -> List[ScrapedContent]:
+        """Scrape all URLs concurrently; pages unfinished at the deadline come back as failures"""
+        logger.info(f"Starting concurrent scrape for {len(urls)} URLs (adaptive concurrency, hard cap {max_concurrent}).")
+        deadline = deadline or Deadline()
+        scrape = self._bounded(max_concurrent)
+        tasks = [asyncio.create_task(scrape(url, deadline)) for url in urls]
+        if tasks: await asyncio.wait(tasks, timeout=deadline.timeout())
+        results = []
+        for url, task in zip(urls, tasks):
+            if task.done(): results.append(task.result())
+            else:
+                task.cancel()
+                results.append(self._failure(url, "Deadline exceeded", deadline_exceeded=True))
+        return results
+
+    async def scrape_stream(self, urls: Union[Iterable[str], AsyncIterable[str]], max_concurrent: Optional[int] = None,
+                            deadline: Optional[Deadline] = None) -> AsyncIterator[ScrapedContent]:
+        """Yield each ScrapedContent as soon as its download finishes.
+
+        urls may be a plain iterable or an async iterator (e.g. a live search stream), in which case
+        scraping starts on the first URLs while later ones are still being produced. At the deadline
+        the stream ends, abandoning unfinished pages, so callers keep what completed in time."""
+        deadline = deadline or Deadline()
+        scrape = self._bounded(max_concurrent)
+        finished: asyncio.Queue = asyncio.Queue()
+        pending = set()
+
+        def submit(url: str):
+            task = asyncio.create_task(scrape(url, deadline))
+            pending.add(task)
+            task.add_done_callback(finished.put_nowait)
+
+        async def feed():
+            if hasattr(urls, "__aiter__"):
+                async for url in urls: submit(url)
+            else:
+                for url in urls: submit(url)
+
+        feeder = asyncio.create_task(feed())
+        feeder.add_done_callback(finished.put_nowait)
+        try:
+            while pending or not feeder.done():
+                try:
+                    task = await asyncio.wait_for(finished.get(), deadline.timeout())
+                except asyncio.TimeoutError:
+                    logger.warning(f"Scrape deadline reached, abandoning {len(pending)} unfinished pages.")
+                    return
+                if task is feeder:
+                    feeder.result()  # surface errors from the URL source
+                    continue
+                pending.discard(task)
+                yield task.result()
+            feeder.result()
+        finally:
+            feeder.cancel()
+            for task in pending: task.cancel()
@@ -3,11 +3,23 @@ import asyncio
 import aiohttp
 import logging
 import os
+from datetime import datetime
+from dataclasses import replace
 from abc import ABC, abstractmethod
 from urllib.parse import quote_plus
-from typing import List
+from typing import Dict, List, Optional
 
-from data_models import SearchResult, SearchResponse
+import numpy as np
+
+from data_models import SearchResult, SearchResponse, ScrapedContent
+from http_client import PooledHTTPClient
+from rate_limiter import HostRateLimiter
+from search_cache import SearchCache
+from provider_health import ProviderHealthTracker
+from single_flight import SingleFlight
+from url_utils import canonicalize_url, clean_url
+from deadline import Deadline
+import config
 
 try:
     from bs4 import BeautifulSoup
@@ -19,32 +31,63 @@ logger = logging.getLogger(__name__)
 
 class SearchAgent(ABC):
     """Abstract base class for search agents"""
-    def __init__(self, base_delay: float = 1.0):
+    # One connection pool shared by every agent, so queries reuse warm TCP/TLS connections
+    http_client = PooledHTTPClient.from_config()
+    # Token buckets keyed by provider, shared by every agent instance and coroutine
+    rate_limiter = HostRateLimiter()
+    source = "search"
+    # Seconds allowed per provider call; a request deadline can only shorten it
+    request_timeout = 15.0
+
+    def __init__(self, base_delay: float = 1.0, burst: int = config.SEARCH_RATE_LIMIT_BURST):
         self.base_delay = base_delay
-        self.last_request_time = 0
+        self.cache: Optional[SearchCache] = None
+        self.inflight = SingleFlight()
+        rate, burst = config.SEARCH_RATE_LIMITS.get(self.source, (1.0 / base_delay if base_delay > 0 else 1000.0, burst))
+        SearchAgent.rate_limiter.configure(self.source, rate, burst)
+
+    async def search(self, query: str, num_results: int = 10, timeout: Optional[float] = None) -> SearchResponse:
+        """Perform a search, serving successful responses from the cache when possible.
+        Identical concurrent searches share a single provider call. timeout defaults to request_timeout."""
+        if self.cache is not None:
+            cached = self.cache.get(self.source, query, num_results)
+            if cached is not None:
+                logger.info(f"Cache hit for {self.source} query '{query}'.")
+                cached.metadata["cached"] = True
+                return cached
+        key = f"{num_results}|{SearchCache.normalize_query(query)}"
+        response = await self.inflight.do(key, lambda: self._search(query, num_results, timeout or self.request_timeout))
+        if self.cache is not None and response.success:
+            self.cache.set(self.source, query, num_results, response)
+        return response
 
     @abstractmethod
-    async def search(self, query: str, num_results: int = 10) -> SearchResponse:
-        """Perform a search and return results"""
+    async def _search(self, query: str, num_results: int = 10, timeout: Optional[float] = None) -> SearchResponse:
+        """Query the provider and return results"""
         pass
 
     async def _rate_limit(self):
-        """Implement rate limiting"""
-        now = time.time()
-        time_since_last = now - self.last_request_time
-        if time_since_last < self.base_delay:
-            delay = self.base_delay - time_since_last
-            logger.debug(f"Rate limiting {type(self).__name__} for {delay:.2f}s")
-            await asyncio.sleep(delay)
-        self.last_request_time = time.time()
+        """Wait for a token from this provider's bucket"""
+        await SearchAgent.rate_limiter.acquire(self.source)
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        return await SearchAgent.http_client.get_session()
+
+    @classmethod
+    async def close_http_client(cls):
+        """Close the shared connection pool"""
+        await SearchAgent.http_client.close()
 
 class DuckDuckGoSearchAgent(SearchAgent):
     """DuckDuckGo search agent using their HTML search page."""
-    async def search(self, query: str, num_results: int = 10) -> SearchResponse:
+    source = "duckduckgo"
+    search_url = "https://html.duckduckgo.com/html/"
+
+    async def _search(self, query: str, num_results: int = 10, timeout: Optional[float] = None) -> SearchResponse:
         await self._rate_limit()
         start_time = time.time()
         encoded_query = quote_plus(query)
-        search_url = f"https://html.duckduckgo.com/html/?q={encoded_query}"
+        search_url = f"{self.search_url}?q={encoded_query}"
         logger.info(f"Searching DuckDuckGo for '{query}'...")
 
         headers = {
@@ -52,19 +95,19 @@ class DuckDuckGoSearchAgent(SearchAgent):
         }
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(search_url, headers=headers, timeout=15) as response:
-                    if response.status == 200:
-                        html = await response.text()
-                        results = self._parse_duckduckgo_results(html, query)
-                        logger.info(f"DuckDuckGo search successful, found {len(results)} results.")
-                        return SearchResponse(
-                            success=True, results=results[:num_results], source="duckduckgo",
-                            total_results=len(results), response_time=time.time() - start_time
-                        )
-                    else:
-                        logger.error(f"DuckDuckGo search failed with HTTP status {response.status}")
-                        raise Exception(f"HTTP {response.status}")
+            session = await self._get_session()
+            async with session.get(search_url, headers=headers, timeout=timeout or self.request_timeout) as response:
+                if response.status == 200:
+                    html = await response.text()
+                    results = self._parse_duckduckgo_results(html, query)
+                    logger.info(f"DuckDuckGo search successful, found {len(results)} results.")
+                    return SearchResponse(
+                        success=True, results=results[:num_results], source="duckduckgo",
+                        total_results=len(results), response_time=time.time() - start_time
+                    )
+                else:
+                    logger.error(f"DuckDuckGo search failed with HTTP status {response.status}")
+                    raise Exception(f"HTTP {response.status}")
         except Exception as e:
             logger.error(f"An error occurred during DuckDuckGo search: {e}", exc_info=True)
             return SearchResponse(
@@ -83,9 +126,10 @@ class DuckDuckGoSearchAgent(SearchAgent):
             result_snippets = soup.find_all('a', class_='result__snippet')
 
             for i, link in enumerate(result_links[:10]):
-                title, url = link.get_text(strip=True), link.get('href', '')
+                title, url = link.get_text(strip=True), clean_url(link.get('href', ''))
                 snippet = result_snippets[i].get_text(strip=True) if i < len(result_snippets) else ""
-                if title and url and not url.startswith('/'):
+                # Result links are usually //duckduckgo.com/l/?uddg=<target> redirects, unwrapped by clean_url
+                if title and url.startswith(('http://', 'https://')):
                     results.append(SearchResult(title=title, url=url, snippet=snippet, source="duckduckgo", metadata={"query": query}))
             
             logger.debug(f"Successfully parsed {len(results)} DuckDuckGo results.")
@@ -95,59 +139,111 @@ class DuckDuckGoSearchAgent(SearchAgent):
             return []
 
 class WikipediaSearchAgent(SearchAgent):
-    """Wikipedia search using their API"""
-    async def search(self, query: str, num_results: int = 10) -> SearchResponse:
+    """Wikipedia search using their API.
+
+    With fetch_extracts, the plain-text extracts of all result pages are fetched in one batched
+    API call and attached as ready-made ScrapedContent under result.metadata['scraped_content'],
+    so the pipeline can skip downloading and parsing those pages."""
+    # The extracts call only runs if the search left at least this much of its timeout
+    MIN_EXTRACT_SECONDS = 1.0
+    source = "wikipedia"
+    request_timeout = 10.0
+    search_url = "https://en.wikipedia.org/w/api.php"
+
+    def __init__(self, base_delay: float = 1.0, fetch_extracts: bool = config.WIKIPEDIA_FETCH_EXTRACTS):
+        super().__init__(base_delay)
+        self.fetch_extracts = fetch_extracts
+
+    async def _search(self, query: str, num_results: int = 10, timeout: Optional[float] = None) -> SearchResponse:
+        # The caller's timeout covers the rate-limit wait too
+        called_at = time.time()
         await self._rate_limit()
         start_time = time.time()
         logger.info(f"Searching Wikipedia for '{query}'...")
-        search_url = "https://en.wikipedia.org/w/api.php"
+        search_url = self.search_url
         params = {
             'action': 'query', 'format': 'json', 'list': 'search',
             'srsearch': query, 'srlimit': min(num_results, 10),
             'srprop': 'snippet|titlesnippet|size'
         }
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(search_url, params=params, timeout=10) as response:
-                    if response.status == 200:
-                        data, results = await response.json(), []
-                        if 'query' in data and 'search' in data['query']:
-                            for item in data['query']['search']:
-                                title = item.get('title', '')
-                                snippet = item.get('snippet', '').replace('<span class="searchmatch">', '').replace('</span>', '')
-                                url = f"https://en.wikipedia.org/wiki/{quote_plus(title.replace(' ', '_'))}"
-                                results.append(SearchResult(
-                                    title=f"Wikipedia: {title}", url=url, snippet=snippet, source="wikipedia",
-                                    metadata={"size": item.get('size', 0)}))
-                        logger.info(f"Wikipedia search successful, found {len(results)} results.")
-                        return SearchResponse(
-                            success=True, results=results, source="wikipedia",
-                            total_results=len(results), response_time=time.time() - start_time)
-                    else:
-                        logger.error(f"Wikipedia search failed with HTTP status {response.status}")
-                        raise Exception(f"HTTP {response.status}")
+            session = await self._get_session()
+            async with session.get(search_url, params=params, timeout=timeout or self.request_timeout) as response:
+                if response.status == 200:
+                    data, results = await response.json(), []
+                    if 'query' in data and 'search' in data['query']:
+                        for item in data['query']['search']:
+                            title = item.get('title', '')
+                            snippet = item.get('snippet', '').replace('<span class="searchmatch">', '').replace('</span>', '')
+                            url = f"https://en.wikipedia.org/wiki/{quote_plus(title.replace(' ', '_'))}"
+                            results.append(SearchResult(
+                                title=f"Wikipedia: {title}", url=url, snippet=snippet, source="wikipedia",
+                                metadata={"size": item.get('size', 0), "page_title": title}))
+                    # Same logical search, so the extracts call shares the search's timeout instead of starting a new one
+                    remaining = (timeout or self.request_timeout) - (time.time() - called_at)
+                    if self.fetch_extracts and results and remaining >= self.MIN_EXTRACT_SECONDS:
+                        await self._attach_extracts(session, search_url, results, remaining)
+                    logger.info(f"Wikipedia search successful, found {len(results)} results.")
+                    return SearchResponse(
+                        success=True, results=results, source="wikipedia",
+                        total_results=len(results), response_time=time.time() - start_time)
+                else:
+                    logger.error(f"Wikipedia search failed with HTTP status {response.status}")
+                    raise Exception(f"HTTP {response.status}")
         except Exception as e:
             logger.error(f"An error occurred during Wikipedia search: {e}", exc_info=True)
             return SearchResponse(
                 success=False, results=[], source="wikipedia", total_results=0,
                 response_time=time.time() - start_time, error_message=str(e))
 
+    async def _attach_extracts(self, session: aiohttp.ClientSession, api_url: str, results: List[SearchResult], timeout: float = 10.0):
+        titles = [r.metadata["page_title"] for r in results]
+        params = {
+            'action': 'query', 'format': 'json', 'prop': 'extracts', 'explaintext': 1,
+            'exlimit': 'max', 'redirects': 1, 'titles': '|'.join(titles)
+        }
+        # The API only returns several extracts per request for intro sections
+        if config.WIKIPEDIA_EXTRACT_INTRO_ONLY: params['exintro'] = 1
+        try:
+            # No second rate-limit token: this is part of the search that already took one
+            async with session.get(api_url, params=params, timeout=timeout) as response:
+                if response.status != 200:
+                    raise Exception(f"HTTP {response.status}")
+                data = await response.json()
+        except Exception as e:
+            logger.warning(f"Fetching Wikipedia extracts failed, pages will be scraped instead: {e}")
+            return
+
+        extracts = {page.get('title'): page.get('extract', '') for page in data.get('query', {}).get('pages', {}).values()}
+        attached = 0
+        for result in results:
+            text = " ".join(extracts.get(result.metadata["page_title"], "").split())
+            if len(text) <= config.WIKIPEDIA_MIN_EXTRACT_CHARS: continue
+            result.metadata["scraped_content"] = ScrapedContent(
+                url=result.url, title=result.title, content=text, text_length=len(text),
+                scrape_timestamp=datetime.now(), success=True, metadata={"method": "wikipedia_extract"})
+            attached += 1
+        logger.info(f"Attached {attached}/{len(results)} Wikipedia extracts from one batched request.")
+
 class SerpApiSearchAgent(SearchAgent):
     """Google Search using the SerpApi service"""
+    source = "serpapi_google"
+    request_timeout = 20.0
+    search_url = "https://serpapi.com/search.json"
 
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, base_delay: float = 1.0):
         # Checks for the SERPAPI_API_KEY environment variable
         self.api_key = api_key or os.environ.get("SERPAPI_API_KEY")
         if not self.api_key:
             raise ValueError("SerpApi API key not found. Please set the SERPAPI_API_KEY environment variable.")
-        super().__init__()
+        super().__init__(base_delay)
 
-    async def search(self, query: str, num_results: int = 10) -> SearchResponse:
+    async def _search(self, query: str, num_results: int = 10, timeout: Optional[float] = None) -> SearchResponse:
         await self._rate_limit()
         start_time = time.time()
         logger.info(f"Searching Google via SerpApi for '{query}'...")
         
-        search_url = "https://serpapi.com/search.json"
+        search_url = self.search_url
         params = {
             "q": query,
             "engine": "google",
@@ -160,24 +256,24 @@ class SerpApiSearchAgent(SearchAgent):
         headers = {'User-Agent': 'python:web-search-rag:v1.0'}
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(search_url, headers=headers, params=params, timeout=20) as response:
-                    if response.status == 200:
-                        data, results = await response.json(), []
-                        for item in data.get("organic_results", []):
-                            title, url, snippet = item.get('title', ''), item.get('link', ''), item.get('snippet', '')
-                            if title and url:
-                                results.append(SearchResult(
-                                    title=f"Google (SerpApi): {title}", url=url, snippet=snippet, source="serpapi_google",
-                                    metadata={"position": item.get('position', 0)}))
-                        
-                        logger.info(f"SerpApi search successful, found {len(results)} results.")
-                        return SearchResponse(
-                            success=True, results=results, source="serpapi_google",
-                            total_results=len(results), response_time=time.time() - start_time)
-                    else:
-                        logger.error(f"SerpApi search failed with HTTP status {response.status}. Response: {await response.text()}")
-                        raise Exception(f"HTTP {response.status}")
+            session = await self._get_session()
+            async with session.get(search_url, headers=headers, params=params, timeout=timeout or self.request_timeout) as response:
+                if response.status == 200:
+                    data, results = await response.json(), []
+                    for item in data.get("organic_results", []):
+                        title, url, snippet = item.get('title', ''), item.get('link', ''), item.get('snippet', '')
+                        if title and url:
+                            results.append(SearchResult(
+                                title=f"Google (SerpApi): {title}", url=url, snippet=snippet, source="serpapi_google",
+                                metadata={"position": item.get('position', 0)}))
+                    
+                    logger.info(f"SerpApi search successful, found {len(results)} results.")
+                    return SearchResponse(
+                        success=True, results=results, source="serpapi_google",
+                        total_results=len(results), response_time=time.time() - start_time)
+                else:
+                    logger.error(f"SerpApi search failed with HTTP status {response.status}. Response: {await response.text()}")
+                    raise Exception(f"HTTP {response.status}")
         except Exception as e:
             logger.error(f"An error occurred during SerpApi search: {e}", exc_info=True)
             return SearchResponse(
@@ -189,36 +285,199 @@ class MultiSearchAgent:
     def __init__(self, search_agents: List[SearchAgent], max_concurrent: int = 3):
         self.search_agents = search_agents
         self.max_concurrent = max_concurrent
+        self.last_batch_stats: Dict = {}
+        self.health = ProviderHealthTracker(
+            alpha=config.PROVIDER_HEALTH_EWMA_ALPHA, failure_threshold=config.PROVIDER_FAILURE_THRESHOLD,
+            min_requests=config.PROVIDER_MIN_REQUESTS, open_duration=config.PROVIDER_OPEN_SECONDS,
+            slow_latency=config.PROVIDER_SLOW_LATENCY)
         logger.info(f"MultiSearchAgent initialized with {len(search_agents)} agents and max concurrency {max_concurrent}.")
 
-    async def search(self, query: str, num_results: int = 10) -> SearchResponse:
+    async def _search_agent(self, agent: SearchAgent, query: str, num_results: int, semaphore: asyncio.Semaphore, deadline: Optional[Deadline] = None,
+                            admit_among: Optional[List[SearchAgent]] = None) -> SearchResponse:
+        """Run one agent under the semaphore and feed the outcome into its health state.
+
+        With admit_among, the circuit breaker is consulted once a semaphore slot is held, so calls queued
+        behind others see the outcomes recorded while they waited."""
+        health, start = self.health.get(agent.source), None
+        try:
+            async with semaphore:
+                if admit_among is not None and not self.health.admit(agent, admit_among):
+                    return SearchResponse(False, [], agent.source, 0, 0, "Circuit open", metadata={"circuit_open": True})
+                start = time.monotonic()
+                # The provider call's own timeout never outlives the request deadline
+                timeout = max(0.1, deadline.timeout(agent.request_timeout)) if deadline is not None and deadline.bounded else None
+                response = await agent.search(query, num_results, timeout=timeout)
+        except asyncio.CancelledError:
+            # Running past the deadline counts against the provider; being cut off after enough results does not
+            if start is not None and deadline is not None and deadline.expired:
+                health.record(False, time.monotonic() - start)
+            else:
+                health.release()
+            raise
+        except Exception as e:
+            logger.warning(f"Search agent {type(agent).__name__} failed: {e}")
+            health.record(False, time.monotonic() - start if start is not None else 0.0)
+            return SearchResponse(False, [], agent.source, 0, 0, str(e))
+
+        if response.metadata.get("cached"): health.release()
+        else: health.record(response.success, time.monotonic() - start)
+        return response
+
+    def get_health(self) -> dict:
+        """Per-provider health and circuit breaker state, for monitoring"""
+        return self.health.snapshot()
+
+    async def _responses_as_completed(self, query: str, num_results: int, deadline: Deadline, cut_off: List[str]):
+        """Yield agent responses as they finish. Agents still running at the deadline
+        or when the consumer stops iterating are cancelled and listed in cut_off."""
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        per_agent = num_results // len(self.search_agents) + 2
+        tasks = {asyncio.create_task(self._search_agent(agent, query, per_agent, semaphore, deadline)): agent
+                 for agent in self.health.select(self.search_agents)}
+        pending = set(tasks)
+        try:
+            while pending:
+                timeout = deadline.timeout()
+                if timeout is not None and timeout <= 0: break
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+                cut_off.append(tasks[task].source)
+            if pending:
+                logger.info(f"Cut off slow search agents: {', '.join(tasks[t].source for t in pending)}")
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def search_stream(self, query: str, num_results: int = 10, latency_budget: Optional[float] = None, deadline: Optional[Deadline] = None):
+        """Async iterator over deduplicated SearchResults, yielded as each agent finishes.
+        Stops after num_results unique results or at the deadline (capped by latency_budget),
+        cancelling agents that are still running."""
+        deadline = (deadline or Deadline()).within(latency_budget)
+        seen_urls, cut_off, yielded = set(), [], 0
+        responses = self._responses_as_completed(query, num_results, deadline, cut_off)
+        try:
+            async for response in responses:
+                if not (isinstance(response, SearchResponse) and response.success): continue
+                logger.info(f"Streaming {len(response.results)} results from {response.source}.")
+                for result in response.results:
+                    key = canonicalize_url(result.url)
+                    if key in seen_urls: continue
+                    seen_urls.add(key)
+                    yield replace(result, url=clean_url(result.url))
+                    yielded += 1
+                    if yielded >= num_results: return
+        finally:
+            await responses.aclose()
+
+    async def search(self, query: str, num_results: int = 10, latency_budget: Optional[float] = None, target_results: Optional[int] = None,
+                     deadline: Optional[Deadline] = None) -> SearchResponse:
+        """Search all agents and merge their results.
+
+        With a latency_budget (seconds), a request deadline and/or target_results, returns as soon as the
+        deduplicated results reach the target or the time runs out, cancelling the remaining agents."""
         start_time = time.time()
         logger.info(f"Starting multi-agent search for '{query}'...")
-        semaphore = asyncio.Semaphore(self.max_concurrent)
+        deadline = (deadline or Deadline()).within(latency_budget)
 
-        async def search_with_semaphore(agent):
-            async with semaphore:
-                try:
-                    return await agent.search(query, num_results // len(self.search_agents) + 2)
-                except Exception as e:
-                    logger.warning(f"Search agent {type(agent).__name__} failed: {e}")
-                    return SearchResponse(False, [], type(agent).__name__, 0, 0, str(e))
+        collected, seen_urls, cut_off = [], set(), []
+        responses = self._responses_as_completed(query, num_results, deadline, cut_off)
+        try:
+            async for response in responses:
+                collected.append(response)
+                if isinstance(response, SearchResponse) and response.success:
+                    seen_urls.update(canonicalize_url(result.url) for result in response.results)
+                if target_results is not None and len(seen_urls) >= target_results: break
+        finally:
+            await responses.aclose()
 
-        search_tasks = [search_with_semaphore(agent) for agent in self.search_agents]
-        responses = await asyncio.gather(*search_tasks, return_exceptions=True)
+        return self._merge_responses(
+            collected, num_results, start_time,
+            metadata={"cut_off_agents": cut_off, "latency_budget": latency_budget, "target_results": target_results})
 
-        all_results, successful_sources, seen_urls = [], [], set()
+    def _merge_responses(self, responses: List[SearchResponse], num_results: int, start_time: float, metadata: dict = None) -> SearchResponse:
+        """Deduplicate on canonical URL and order by reciprocal rank fusion of the provider rankings"""
+        unique_results, successful_sources, key_index = [], [], {}
+        entry_urls, entry_ranks, entry_weights = [], [], []
         for response in responses:
-            if isinstance(response, SearchResponse) and response.success:
-                for result in response.results:
-                    if result.url not in seen_urls:
-                        seen_urls.add(result.url)
-                        all_results.append(result)
-                successful_sources.append(response.source)
+            if not (isinstance(response, SearchResponse) and response.success): continue
+            successful_sources.append(response.source)
+            weight = config.RRF_PROVIDER_WEIGHTS.get(response.source, 1.0)
+            for rank, result in enumerate(response.results):
+                key = canonicalize_url(result.url)
+                if key not in key_index:
+                    key_index[key] = len(unique_results)
+                    unique_results.append(replace(result, url=clean_url(result.url), metadata=dict(result.metadata)))
+                entry_urls.append(key_index[key])
+                entry_ranks.append(rank)
+                entry_weights.append(weight)
 
-        logger.info(f"Combined {len(all_results)} unique results from {len(successful_sources)} sources.")
-        all_results.sort(key=lambda x: (len(x.snippet), 1 if x.source == "wikipedia" else 0), reverse=True)
-        
+        if unique_results:
+            # score(url) = sum over providers of weight / (k + rank), as one bincount over all (provider, rank) entries
+            url_idx = np.asarray(entry_urls)
+            contributions = np.asarray(entry_weights) / (config.RRF_K + np.asarray(entry_ranks) + 1)
+            scores = np.bincount(url_idx, weights=contributions, minlength=len(unique_results))
+            votes = np.bincount(url_idx, minlength=len(unique_results))
+            order = np.argsort(-scores, kind="stable")
+            for i in order[:num_results]:
+                unique_results[i].metadata.update({"rrf_score": float(scores[i]), "provider_votes": int(votes[i])})
+            fused = [unique_results[i] for i in order]
+        else:
+            fused = []
+
+        logger.info(f"Combined {len(fused)} unique results from {len(successful_sources)} sources.")
         return SearchResponse(
-            success=len(all_results) > 0, results=all_results[:num_results], source="+".join(successful_sources),
-            total_results=len(all_results), response_time=time.time() - start_time)
\ No newline at end of file
+            success=len(fused) > 0, results=fused[:num_results], source="+".join(successful_sources),
+            total_results=len(fused), response_time=time.time() - start_time, metadata=metadata or {})
+
+    async def search_many(self, queries: List[str], num_results: int = 10, max_concurrent: Optional[int] = None, provider_quotas: Optional[Dict[str, int]] = None):
+        """Run a batch of queries across all agents, yielding (query, SearchResponse) as each query completes.
+
+        Every provider call shares one global concurrency limit, providers keep their own rate limits, and
+        provider_quotas caps the number of calls per provider for the whole batch. Throughput and quota
+        usage are stored in self.last_batch_stats once the batch finishes."""
+        start_time = time.time()
+        semaphore = asyncio.Semaphore(max_concurrent or self.max_concurrent)
+        quotas = dict(provider_quotas or {})
+        provider_calls = {agent.source: 0 for agent in self.search_agents}
+        per_agent = num_results // len(self.search_agents) + 2
+        logger.info(f"Starting batch search of {len(queries)} queries across {len(self.search_agents)} agents.")
+
+        async def search_agent(agent: SearchAgent, query: str) -> SearchResponse:
+            if agent.source in quotas:
+                if quotas[agent.source] <= 0:
+                    return SearchResponse(False, [], agent.source, 0, 0, "Provider quota exhausted")
+                quotas[agent.source] -= 1
+            response = await self._search_agent(agent, query, per_agent, semaphore, admit_among=self.search_agents)
+            if response.metadata.get("circuit_open"):
+                # Skipped without calling the provider, so the quota is handed back
+                if agent.source in quotas: quotas[agent.source] += 1
+            else:
+                provider_calls[agent.source] += 1
+            return response
+
+        async def search_query(query: str):
+            query_start = time.time()
+            # Every query's tasks start before any call has finished, so the circuits are checked per call, not here
+            responses = await asyncio.gather(*(search_agent(agent, query) for agent in self.health.rank(self.search_agents)))
+            return query, self._merge_responses(responses, num_results, query_start)
+
+        tasks = [asyncio.create_task(search_query(query)) for query in queries]
+        completed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+                completed += 1
+        finally:
+            for task in tasks: task.cancel()
+            # Let cancelled provider calls unwind (and release their health/quota state) before reporting
+            await asyncio.gather(*tasks, return_exceptions=True)
+            elapsed = time.time() - start_time
+            self.last_batch_stats = {
+                "queries": len(queries), "completed": completed, "elapsed": elapsed,
+                "queries_per_second": completed / elapsed if elapsed > 0 else 0.0,
+                "provider_calls": provider_calls,
+                "quota_exhausted": [source for source, remaining in quotas.items() if remaining <= 0]}
+            logger.info(f"Batch search finished: {completed}/{len(queries)} queries in {elapsed:.2f}s "
+                        f"({self.last_batch_stats['queries_per_second']:.2f} queries/s).")
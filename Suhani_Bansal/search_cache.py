@@ -0,0 +1,99 @@
+import copy
+import pickle
+import sqlite3
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from data_models import SearchResponse
+
+logger = logging.getLogger(__name__)
+
+class SearchCache:
+    """Two-tier search result cache: in-memory LRU in front of an optional SQLite table"""
+    def __init__(self, max_entries: int = 1024, ttls: Optional[Dict[str, float]] = None, default_ttl: float = 3600, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.db_path = db_path
+        self._memory: "OrderedDict[str, Tuple[float, SearchResponse]]" = OrderedDict()
+        self.hits = self.misses = self.disk_hits = 0
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache (key TEXT PRIMARY KEY, provider TEXT, expires_at REAL, payload BLOB)")
+            self._db.commit()
+            logger.info(f"Search cache backed by SQLite at {db_path}")
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def make_key(self, provider: str, query: str, num_results: int) -> str:
+        return f"{provider}|{num_results}|{self.normalize_query(query)}"
+
+    def _remember(self, key: str, expires_at: float, response: SearchResponse):
+        self._memory[key] = (expires_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, provider: str, query: str, num_results: int) -> Optional[SearchResponse]:
+        key, now = self.make_key(provider, query, num_results), time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            del self._memory[key]
+
+        if self._db is not None:
+            row = self._db.execute("SELECT expires_at, payload FROM search_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                if row[0] > now:
+                    response = pickle.loads(row[1])
+                    self._remember(key, row[0], response)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return copy.deepcopy(response)
+                self._db.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                self._db.commit()
+
+        self.misses += 1
+        return None
+
+    def set(self, provider: str, query: str, num_results: int, response: SearchResponse):
+        ttl = self.ttls.get(provider, self.default_ttl)
+        if ttl <= 0: return
+        key, expires_at = self.make_key(provider, query, num_results), time.time() + ttl
+        self._remember(key, expires_at, copy.deepcopy(response))
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO search_cache (key, provider, expires_at, payload) VALUES (?, ?, ?, ?)",
+                (key, provider, expires_at, pickle.dumps(response)))
+            self._db.commit()
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        expired = [k for k, (expires_at, _) in self._memory.items() if expires_at <= now]
+        for key in expired: del self._memory[key]
+        removed = len(expired)
+        if self._db is not None:
+            removed += self._db.execute("DELETE FROM search_cache WHERE expires_at <= ?", (now,)).rowcount
+            self._db.commit()
+        return removed
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses, "disk_hits": self.disk_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory), "persistent": self._db is not None}
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
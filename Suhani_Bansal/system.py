@@ -1,54 +1,152 @@
 import time
 import logging
+from contextlib import aclosing
 from urllib.parse import urlparse
 import pickle
+from typing import Optional
 import numpy as np
 
-from search_agents import DuckDuckGoSearchAgent, WikipediaSearchAgent, MultiSearchAgent
+from search_agents import DuckDuckGoSearchAgent, WikipediaSearchAgent, MultiSearchAgent, SearchAgent
 from scraper import WebScraperAgent
-from rag_agent import ImprovedRAGAgent, EMBEDDINGS_AVAILABLE
+from rate_limiter import HostRateLimiter
+from concurrency_limiter import AdaptiveConcurrencyLimiter
+from search_cache import SearchCache
+from page_cache import PageCache
+from rag_agent import ImprovedRAGAgent
 from data_models import RAGResult
+from deadline import Deadline
 import config
 
 logger = logging.getLogger(__name__)
 
 class RobustWebSearchRAGSystem:
     """Main system that orchestrates search, scraping, and RAG."""
-    def __init__(self, search_agents: list, use_embeddings: bool = True, scraper_config: dict = None, rag_config: dict = None):
+    def __init__(self, search_agents: list, use_embeddings: bool = True, scraper_config: dict = None, rag_config: dict = None, search_cache: SearchCache = None):
         logger.info("Initializing Robust Web Search RAG System...")
         self.scraper_config = scraper_config or {}
         self.rag_config = rag_config or {}
+        # Per-host pacing for scraping, with overrides from SCRAPER_HOST_RATE_LIMITS
+        scrape_delay = self.scraper_config.get('rate_limit_delay', config.SCRAPER_RATE_LIMIT_DELAY)
+        self.scrape_rate_limiter = HostRateLimiter(
+            default_rate=1.0 / scrape_delay if scrape_delay > 0 else 1000.0,
+            default_burst=config.SCRAPER_RATE_LIMIT_BURST, limits=config.SCRAPER_HOST_RATE_LIMITS)
+        self.scrape_concurrency = AdaptiveConcurrencyLimiter(
+            initial_limit=config.SCRAPER_MAX_CONCURRENT, min_limit=config.SCRAPER_CONCURRENCY_MIN, max_limit=config.SCRAPER_CONCURRENCY_MAX,
+            host_initial_limit=config.SCRAPER_HOST_CONCURRENCY_INITIAL, host_max_limit=config.SCRAPER_HOST_CONCURRENCY_MAX,
+            backoff=config.SCRAPER_CONCURRENCY_BACKOFF, latency_target=config.SCRAPER_CONCURRENCY_LATENCY_TARGET,
+            global_overload_hosts=config.SCRAPER_GLOBAL_OVERLOAD_HOSTS, overload_window=config.SCRAPER_OVERLOAD_WINDOW)
+        self.page_cache = PageCache(
+            config.PAGE_CACHE_DIR, max_bytes=config.PAGE_CACHE_MAX_BYTES, default_freshness=config.PAGE_CACHE_DEFAULT_FRESHNESS,
+            domain_freshness=config.PAGE_CACHE_DOMAIN_FRESHNESS) if config.PAGE_CACHE_DIR else None
+        # One long-lived scraper, so concurrent queries share its session and coalesce duplicate page fetches
+        self.scraper = WebScraperAgent(
+            **{'extraction_workers': config.SCRAPER_EXTRACTION_WORKERS, 'extraction_backends': config.SCRAPER_EXTRACTION_BACKENDS,
+               'max_body_bytes': config.SCRAPER_MAX_BODY_BYTES, 'allowed_content_types': config.SCRAPER_ALLOWED_CONTENT_TYPES,
+               'page_cache': self.page_cache, **self.scraper_config},
+            rate_limiter=self.scrape_rate_limiter, concurrency_limiter=self.scrape_concurrency)
         
         # Now accepts a list of agents and passes it to the MultiSearchAgent
         self.search_agents = search_agents
+        if search_cache is None and config.SEARCH_CACHE_ENABLED:
+            search_cache = SearchCache(
+                max_entries=config.SEARCH_CACHE_MAX_ENTRIES, ttls=config.SEARCH_CACHE_TTLS,
+                default_ttl=config.SEARCH_CACHE_DEFAULT_TTL, db_path=config.SEARCH_CACHE_DB_PATH)
+        self.search_cache = search_cache
+        for agent in self.search_agents: agent.cache = self.search_cache
         self.multi_search = MultiSearchAgent(self.search_agents, max_concurrent=config.MULTI_SEARCH_CONCURRENCY)
         
         self.rag_agent = ImprovedRAGAgent(
             use_embeddings=use_embeddings, **self.rag_config)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """Release the pooled HTTP connections, the scraper session, the caches and the RAG agent's index thread and embedding cache"""
+        await SearchAgent.close_http_client()
+        await self.scraper.close()
+        if self.search_cache: self.search_cache.close()
+        if self.page_cache: self.page_cache.close()
+        self.rag_agent.close()
     
-    async def query_with_rag(self, query: str, search_first: bool = True, num_search_results: int = 8) -> dict:
+    async def query_with_rag(self, query: str, search_first: bool = True, num_search_results: int = 8, deadline: Optional[Deadline] = None) -> dict:
+        """Search, scrape, index and answer within one time budget (config.QUERY_TIME_BUDGET unless a
+        deadline is given). Stages that run out of time return what they have so far."""
         logger.info(f"--- Starting new RAG pipeline for query: '{query}' ---")
         start_time = time.time()
+        deadline = deadline or Deadline(config.QUERY_TIME_BUDGET)
+        # Search and scraping stop early enough to leave time for embedding the last pages and answering
+        fetch_deadline = deadline.reserve(config.QUERY_FINALIZE_RESERVE)
         try:
             if not query.strip(): return {"error": "Empty query provided"}
             
             scraped_contents = []
             if search_first:
-                logger.info("[STEP 1/4] Performing multi-agent search.")
-                search_response = await self.multi_search.search(query, num_search_results)
-                if not search_response.success or not search_response.results:
-                    return {"error": "Search failed or returned no results"}
-                
-                valid_urls = [r.url for r in search_response.results if urlparse(r.url).scheme in ['http', 'https']]
-                logger.info(f"[STEP 2/4] Scraping {len(valid_urls)} valid URLs.")
-                if not valid_urls: return {"error": "No valid URLs found to scrape"}
-                
-                async with WebScraperAgent(**self.scraper_config) as scraper:
-                    scraped_contents = await scraper.scrape_multiple_urls(valid_urls, config.SCRAPER_MAX_CONCURRENT)
-                
-                successful_contents = [c for c in scraped_contents if c.success and len(c.content) > 100]
-                logger.info(f"[STEP 3/4] Indexing content from {len(successful_contents)} successfully scraped pages.")
-                if successful_contents: await self.rag_agent.index_documents(successful_contents)
+                logger.info("[STEP 1/4] Multi-agent search; " + ("snippets are ranked before scraping." if config.SCRAPE_PRUNING_ENABLED
+                                                                   else "scraping starts as results arrive."))
+                latency_budget = config.MULTI_SEARCH_LATENCY_BUDGET if config.MULTI_SEARCH_HEDGED else None
+                num_results, to_index, indexed_pages = 0, [], 0
+                pruning = {"enabled": config.SCRAPE_PRUNING_ENABLED, "candidates": 0, "selected": 0, "early_stopped": False}
+
+                def take_prefetched(result) -> bool:
+                    if result.metadata.get("scraped_content") is None: return False
+                    logger.info(f"[STEP 2/4] Using prefetched content for {result.url}, skipping scrape.")
+                    scraped_contents.append(result.metadata["scraped_content"])
+                    to_index.append(result.metadata["scraped_content"])
+                    return True
+
+                # When ranking, scraping waits for the search to finish, so the search may only use part of the budget
+                search_deadline = fetch_deadline.share(config.SCRAPE_PRUNING_SEARCH_SHARE) if pruning["enabled"] else fetch_deadline
+
+                async def urls_to_scrape():
+                    nonlocal num_results
+                    candidates = []
+                    async for result in self.multi_search.search_stream(query, num_search_results, latency_budget=latency_budget, deadline=search_deadline):
+                        num_results += 1
+                        if take_prefetched(result) or urlparse(result.url).scheme not in ['http', 'https']: continue
+                        if pruning["enabled"]:
+                            candidates.append(result)
+                        else:
+                            logger.info(f"[STEP 2/4] Scraping {result.url} while search continues.")
+                            pruning["selected"] += 1
+                            yield result.url
+                    if not candidates: return
+                    # Rank every snippet against the query in one batch and scrape only the promising pages, best first
+                    scores = await self.rag_agent.score_texts(query, [f"{r.title} {r.snippet}" for r in candidates])
+                    ranked = sorted(zip(scores, candidates), key=lambda pair: -pair[0])
+                    # If nothing clears the bar, the best candidate is still scraped rather than answering from nothing
+                    selected = [r for score, r in ranked if score >= config.SCRAPE_MIN_SNIPPET_SCORE][:config.SCRAPE_TOP_CANDIDATES] or [ranked[0][1]]
+                    pruning["candidates"], pruning["selected"] = len(candidates), len(selected)
+                    logger.info(f"[STEP 2/4] Scraping {len(selected)}/{len(candidates)} pages ranked by snippet relevance.")
+                    for result in selected: yield result.url
+
+                async def index_pending(label: str):
+                    nonlocal to_index, indexed_pages
+                    logger.info(f"[STEP 3/4] Indexing {label} of {len(to_index)} pages.")
+                    batch, to_index = to_index, []
+                    await self.rag_agent.index_documents(batch, deadline=deadline)
+                    indexed_pages += len(batch)
+
+                # Pages are chunked and embedded in micro-batches while the remaining downloads keep running
+                async with aclosing(self.scraper.scrape_stream(urls_to_scrape(), deadline=fetch_deadline)) as pages:
+                    async for content in pages:
+                        scraped_contents.append(content)
+                        if content.success and len(content.content) > 100: to_index.append(content)
+                        if len(to_index) < config.RAG_INDEX_BATCH_SIZE: continue
+                        await index_pending("micro-batch")
+                        if config.EARLY_STOP_CONFIDENT_CHUNKS and await self.rag_agent.count_confident_chunks(
+                                query, config.EARLY_STOP_MIN_SCORE) >= config.EARLY_STOP_CONFIDENT_CHUNKS:
+                            logger.info("[STEP 3/4] Enough high-confidence chunks indexed, stopping scraping early.")
+                            pruning["early_stopped"] = True
+                            break
+
+                if not num_results: return {"error": "Search failed or returned no results"}
+                if not scraped_contents: return {"error": "No valid URLs found to scrape"}
+                if to_index: await index_pending("final batch")
+                logger.info(f"[STEP 3/4] Indexed content from {indexed_pages} successfully scraped pages.")
             
             logger.info("[STEP 4/4] Querying RAG index.")
             rag_result = await self.rag_agent.query(query, top_k=num_search_results)
@@ -57,7 +155,8 @@ class RobustWebSearchRAGSystem:
             logger.info(f"--- RAG pipeline completed in {total_time:.2f}s ---")
             return {
                 "success": True, "rag_result": rag_result, "scraped_contents": scraped_contents,
-                "total_processing_time": total_time, "statistics": self._get_statistics()}
+                "total_processing_time": total_time, "partial": fetch_deadline.expired,
+                "scrape_pruning": pruning if search_first else None, "statistics": self._get_statistics()}
         except Exception as e:
             logger.critical(f"A critical error occurred in the RAG pipeline: {e}", exc_info=True)
             return {"error": f"System error: {str(e)}"}
@@ -68,7 +167,16 @@ class RobustWebSearchRAGSystem:
             "total_chunks": len(doc_chunks),
             "unique_sources": len(set(c.source_url for c in doc_chunks)),
             "embeddings_enabled": self.rag_agent.use_embeddings,
-            "avg_chunk_size": np.mean([c.metadata.get('word_count', 0) for c in doc_chunks]) if doc_chunks else 0
+            "avg_chunk_size": np.mean([c.metadata.get('word_count', 0) for c in doc_chunks]) if doc_chunks else 0,
+            "search_cache": self.search_cache.stats() if self.search_cache else None,
+            "page_cache": self.page_cache.stats() if self.page_cache else None,
+            "provider_health": self.multi_search.get_health(),
+            "scrape_coalescing": self.scraper.inflight.stats(),
+            "scrape_concurrency": self.scrape_concurrency.stats(),
+            "vector_index": self.rag_agent.index.stats(),
+            "keyword_index": self.rag_agent.keyword_index.stats(),
+            "embedding_cache": self.rag_agent.embedding_cache.stats() if self.rag_agent.embedding_cache else None,
+            "deduplication": self.rag_agent.dedup.stats() if self.rag_agent.dedup else None
         }
 
     def save_index(self, filepath: str):
@@ -84,10 +192,8 @@ class RobustWebSearchRAGSystem:
         logger.info(f"Loading index from {filepath}...")
         with open(filepath, 'rb') as f: data = pickle.load(f)
         
-        self.rag_agent.document_chunks = data["document_chunks"]
+        self.rag_agent.load_chunks(data["document_chunks"])
         if self.rag_agent.use_embeddings and data.get("embeddings") is not None:
-            self.rag_agent.embeddings = data["embeddings"]
-            if EMBEDDINGS_AVAILABLE:
-                # ... (FAISS index creation logic from rag_agent.py) ...
-                logger.info("FAISS index successfully loaded and rebuilt.")
+            self.rag_agent.load_embeddings(data["embeddings"])
+            logger.info("FAISS index successfully loaded and rebuilt.")
         logger.info(f"Index loaded successfully with {len(self.rag_agent.document_chunks)} chunks.")
\ No newline at end of file
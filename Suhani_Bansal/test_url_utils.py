@@ -0,0 +1,19 @@
+from url_utils import canonicalize_url, clean_url
+
+def test_clean_url_removes_tracking_and_keeps_query_bytes():
+    assert clean_url("HTTPS://Example.com:443/p?a&utm_source=x&b=%20c&d=&fbclid=1#frag") == "https://example.com/p?a&b=%20c&d="
+
+def test_clean_url_keeps_ref_parameter():
+    assert clean_url("https://example.com/p?ref=main") == "https://example.com/p?ref=main"
+
+def test_clean_url_unwraps_duckduckgo_redirect():
+    assert clean_url("//duckduckgo.com/l/?uddg=https%3A%2F%2Fexample.com%2Fa%3Futm_medium%3Dx") == "https://example.com/a"
+
+def test_malformed_port_does_not_raise():
+    assert clean_url(" https://ex.com:99999/ ") == "https://ex.com:99999/"
+    assert clean_url("https://ex.com:abc/") == "https://ex.com:abc/"
+    assert canonicalize_url("https://ex.com:99999/") == "https://ex.com:99999/"
+    assert canonicalize_url("http://[::1/") == "http://[::1/"
+
+def test_canonicalize_url_folds_variants():
+    assert canonicalize_url("http://www.example.com/a/?b=1&a") == canonicalize_url("https://example.com/a?a=&b=1")
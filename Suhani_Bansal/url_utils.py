@@ -0,0 +1,57 @@
+import re
+from urllib.parse import parse_qsl, unquote_plus, urlencode, urlsplit, urlunsplit
+
+TRACKING_PARAMS = {
+    "gclid", "dclid", "fbclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "ref_src", "_ga", "_hsenc", "_hsmi", "spm", "srsltid"}
+TRACKING_PREFIXES = ("utm_",)
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+_REDIRECT_HOSTS = re.compile(r"(^|\.)duckduckgo\.com$")
+
+def _is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+def unwrap_redirect(url: str) -> str:
+    """Return the target of a DuckDuckGo /l/?uddg= redirect link, or the URL unchanged"""
+    if url.startswith("//"): url = "https:" + url
+    parts = urlsplit(url)
+    if _REDIRECT_HOSTS.search(parts.hostname or "") and parts.path.startswith("/l/"):
+        target = dict(parse_qsl(parts.query)).get("uddg")
+        if target: return unwrap_redirect(target)
+    return url
+
+def clean_url(url: str) -> str:
+    """Fetchable form of a URL: redirect wrappers unwrapped, tracking parameters and fragment
+    removed, scheme and host lower-cased and default port dropped. The path and the remaining
+    query segments are left byte-for-byte as they were. A URL that cannot be parsed (for
+    example a malformed or out-of-range port) is returned stripped but otherwise unchanged."""
+    url = url.strip()
+    try:
+        url = unwrap_redirect(url)
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if port and _DEFAULT_PORTS.get(scheme) == str(port):
+        netloc = netloc.rsplit(":", 1)[0]
+    # Filter the raw segments rather than re-encoding: "?a" vs "?a=" or "%20" vs "+" can be different resources
+    query = "&".join(segment for segment in parts.query.split("&")
+                     if not _is_tracking_param(unquote_plus(segment.split("=", 1)[0])))
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+def canonicalize_url(url: str) -> str:
+    """Dedup key for a URL: clean_url plus http/https, www., trailing-slash and
+    query-order differences folded together. Not meant to be fetched. An unparsable URL is its own key."""
+    url = clean_url(url)
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    netloc = parts.netloc[4:] if parts.netloc.startswith("www.") else parts.netloc
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    scheme = "https" if parts.scheme in ("http", "https") else parts.scheme
+    return urlunsplit((scheme, netloc, path, query, ""))
@@ -0,0 +1,205 @@
+"""Vector storage and search for the RAG agent.
+
+EmbeddingBuffer keeps the normalised vectors; VectorIndex searches them with an exact flat index
+or an approximate one (HNSW / IVF) chosen by corpus size. Approximate indexes are built, and IVF
+is retrained as the corpus outgrows its centroids, in a background thread while the current index
+keeps serving; vectors added meanwhile are copied over when the new index is swapped in.
+"""
+import logging
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+INDEX_KINDS = ("auto", "flat", "hnsw", "ivf")
+
+class EmbeddingBuffer:
+    """Growable float32 matrix. Rows are written into preallocated capacity that doubles when full,
+    so appending a batch costs O(batch) amortised instead of copying every earlier row."""
+    def __init__(self, dimension: Optional[int] = None, initial_capacity: int = 1024):
+        self.dimension = dimension
+        self.initial_capacity = initial_capacity
+        self._data: Optional[np.ndarray] = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self._data is None else self._data.shape[0]
+
+    def _reserve(self, rows: int):
+        if self._data is None:
+            self._data = np.empty((max(self.initial_capacity, rows), self.dimension), dtype=np.float32)
+            return
+        if rows <= self.capacity: return
+        capacity = self.capacity
+        while capacity < rows: capacity *= 2
+        grown = np.empty((capacity, self.dimension), dtype=np.float32)
+        grown[:self._size] = self._data[:self._size]
+        self._data = grown
+
+    def append(self, vectors: np.ndarray):
+        if len(vectors) == 0: return
+        if self.dimension is None: self.dimension = vectors.shape[1]
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected {self.dimension}-dimensional vectors, got {vectors.shape[1]}")
+        self._reserve(self._size + len(vectors))
+        self._data[self._size:self._size + len(vectors)] = vectors
+        self._size += len(vectors)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """View of the filled rows (no copy)"""
+        if self._data is None: return np.empty((0, self.dimension or 0), dtype=np.float32)
+        return self._data[:self._size]
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if self._data is None else self._data.nbytes
+
+class VectorIndex:
+    """Inner-product index over L2-normalised vectors with pluggable FAISS backends.
+
+    kind="auto" stays exact (flat) below flat_threshold vectors and then moves to `approximate`
+    ("hnsw" or "ivf"). Search-time knobs: hnsw_ef_search for HNSW, ivf_nprobe for IVF."""
+    def __init__(self, kind: str = "auto", approximate: str = "ivf", flat_threshold: int = 50_000,
+                 hnsw_m: int = 32, hnsw_ef_construction: int = 200, hnsw_ef_search: int = 64,
+                 ivf_nlist: Optional[int] = None, ivf_nprobe: int = 16, ivf_retrain_growth: float = 2.0,
+                 background: bool = True):
+        if kind not in INDEX_KINDS: raise ValueError(f"Unknown index kind '{kind}', expected one of {INDEX_KINDS}")
+        if approximate not in ("hnsw", "ivf"): raise ValueError("approximate must be 'hnsw' or 'ivf'")
+        self.kind = kind
+        self.approximate = approximate
+        self.flat_threshold = flat_threshold
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.hnsw_ef_search = hnsw_ef_search
+        self.ivf_nlist = ivf_nlist
+        self.ivf_nprobe = ivf_nprobe
+        self.ivf_retrain_growth = ivf_retrain_growth
+        self.background = background
+        self.buffer = EmbeddingBuffer()
+        self.index = None
+        self.active_kind: Optional[str] = None
+        self.trained_size = 0
+        self.rebuilds = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Optional[Tuple[Future, str, int]] = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.buffer)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self.buffer.vectors
+
+    def _target_kind(self, size: int) -> str:
+        if self.kind != "auto": return self.kind
+        return "flat" if size < self.flat_threshold else self.approximate
+
+    def _nlist(self, size: int) -> int:
+        return self.ivf_nlist or int(min(65536, max(16, 4 * math.sqrt(size))))
+
+    def _build(self, kind: str, vectors: np.ndarray):
+        """Build a populated index of the given kind (runs in the background thread for approximate kinds)"""
+        dimension = vectors.shape[1]
+        start = time.perf_counter()
+        if kind == "flat":
+            index = faiss.IndexFlatIP(dimension)
+        elif kind == "hnsw":
+            index = faiss.IndexHNSWFlat(dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = self.hnsw_ef_construction
+            index.hnsw.efSearch = self.hnsw_ef_search
+        else:
+            # faiss k-means wants at least 39 training points per centroid
+            nlist = max(1, min(self._nlist(len(vectors)), len(vectors) // 39))
+            index = faiss.IndexIVFFlat(faiss.IndexFlatIP(dimension), dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+            # k-means does not need every vector; a few hundred per centroid is plenty
+            sample = vectors if len(vectors) <= nlist * 256 else vectors[np.random.default_rng(0).choice(len(vectors), nlist * 256, replace=False)]
+            index.train(sample)
+            index.nprobe = self.ivf_nprobe
+        index.add(vectors)
+        logger.info(f"Built {kind} index over {len(vectors)} vectors in {time.perf_counter() - start:.2f}s")
+        return index
+
+    def _swap_if_ready(self):
+        if self._pending is None or not self._pending[0].done(): return
+        future, kind, built_size = self._pending
+        self._pending = None
+        try:
+            index = future.result()
+        except Exception as e:
+            logger.error(f"Background {kind} index build failed, keeping the {self.active_kind} index: {e}")
+            return
+        with self._lock:
+            # Vectors added while the build was running still have to go in
+            if len(self.buffer) > built_size: index.add(self.buffer.vectors[built_size:])
+            self.index, self.active_kind, self.trained_size = index, kind, built_size
+            self.rebuilds += 1
+        logger.info(f"Switched to {kind} index ({self.index.ntotal} vectors).")
+
+    def _schedule_rebuild(self, kind: str):
+        # A view of the rows written so far: later appends never touch them, even if the buffer grows
+        snapshot = self.buffer.vectors
+        if not self.background:
+            self._pending = (Future(), kind, len(snapshot))
+            self._pending[0].set_result(self._build(kind, snapshot))
+            return
+        if self._executor is None: self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vector-index")
+        logger.info(f"Building {kind} index over {len(snapshot)} vectors in the background.")
+        self._pending = (self._executor.submit(self._build, kind, snapshot), kind, len(snapshot))
+
+    def add(self, vectors: np.ndarray):
+        """Append normalised vectors; they are searchable immediately"""
+        if len(vectors) == 0: return
+        self._swap_if_ready()
+        with self._lock:
+            self.buffer.append(vectors)
+            if self.index is None:
+                self.index, self.active_kind = self._build("flat", vectors), "flat"
+                self.trained_size = len(vectors)
+            else:
+                self.index.add(vectors)
+        if self._pending is not None: return
+        target = self._target_kind(len(self.buffer))
+        if target != self.active_kind:
+            self._schedule_rebuild(target)
+        elif target == "ivf" and len(self.buffer) >= self.trained_size * self.ivf_retrain_growth:
+            # Centroids trained on a much smaller corpus give unbalanced lists and poor recall
+            self._schedule_rebuild("ivf")
+        self._swap_if_ready()
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Same contract as faiss Index.search: (scores, ids), with id -1 where fewer than k were found"""
+        self._swap_if_ready()
+        with self._lock:
+            return self.index.search(queries, k)
+
+    def wait(self):
+        """Block until a background build finishes and swap it in (benchmarks, shutdown)"""
+        if self._pending is not None:
+            self._pending[0].result()
+            self._swap_if_ready()
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {"vectors": len(self), "kind": self.active_kind, "configured": self.kind, "rebuilds": self.rebuilds,
+                "building": self._pending[1] if self._pending else None, "buffer_bytes": self.buffer.nbytes}
@@ -13,6 +13,7 @@ from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 from dotenv import load_dotenv
 from WebSearchAgents import fallback_search
+from embedding_cache import CachedEmbeddings
 
 load_dotenv()
 
@@ -55,7 +56,8 @@ class RAGSystem:
     """Builds a vector store from scraped data and answers questions using a language model."""
     def __init__(self):
         """Initialize embeddings, splitter, vectorstore, and language model."""
-        self.embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        base_embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        self.embeddings = CachedEmbeddings(base_embeddings, base_embeddings.model_name)
         self.splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
         self.vectorstore = None
         
@@ -0,0 +1,79 @@
+"""
+Bounded on-disk cache for chunk embeddings, so pages scraped again are not re-embedded.
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embeddings model with a size-capped, least-recently-used cache on disk.
+
+    Vectors live in a memory-mapped float32 matrix of max_rows rows; index.json maps the
+    sha256 of the normalized text to its row, oldest use first. One folder per model name.
+    """
+    def __init__(self, embeddings: Embeddings, model_name: str, cache_dir: str = ".embedding_cache", max_rows: int = 50000):
+        """Open (or start) the cache folder for model_name."""
+        self.embeddings = embeddings
+        self.max_rows = max_rows
+        self.folder = os.path.join(cache_dir, model_name.replace('/', '_'))
+        os.makedirs(self.folder, exist_ok=True)
+        self.index_path = os.path.join(self.folder, 'index.json')
+        self.vectors_path = os.path.join(self.folder, 'vectors.npy')
+        self.rows = OrderedDict()
+        self.vectors = None
+        if os.path.exists(self.index_path) and os.path.exists(self.vectors_path):
+            self.vectors = np.load(self.vectors_path, mmap_mode='r+')
+            if self.vectors.shape[0] == max_rows:
+                with open(self.index_path) as f:
+                    self.rows = json.load(f, object_pairs_hook=OrderedDict)
+            else:
+                self.vectors = None
+
+    @staticmethod
+    def key(text: str) -> str:
+        """Hash of the text with case and whitespace folded (the MiniLM tokenizer ignores both)."""
+        return hashlib.sha256(' '.join(text.lower().split()).encode('utf-8')).hexdigest()
+
+    def _free_row(self) -> int:
+        """Next unused row, or the least recently used one once the matrix is full."""
+        if len(self.rows) < self.max_rows:
+            return len(self.rows)
+        return self.rows.popitem(last=False)[1]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, sending only the ones not cached yet to the model."""
+        keys = [self.key(text) for text in texts]
+        result = [None] * len(texts)
+        todo = {}
+        for i, k in enumerate(keys):
+            if k in self.rows:
+                self.rows.move_to_end(k)
+                result[i] = self.vectors[self.rows[k]].tolist()
+            else:
+                todo.setdefault(k, []).append(i)
+
+        if todo:
+            new_vectors = self.embeddings.embed_documents([texts[idx[0]] for idx in todo.values()])
+            if self.vectors is None:
+                self.vectors = np.lib.format.open_memmap(self.vectors_path, mode='w+', dtype=np.float32,
+                                                         shape=(self.max_rows, len(new_vectors[0])))
+            for (k, idx), vector in zip(todo.items(), new_vectors):
+                for i in idx:
+                    result[i] = list(vector)
+                row = self._free_row()
+                self.vectors[row] = vector
+                self.rows[k] = row
+            self.vectors.flush()
+        with open(self.index_path, 'w') as f:
+            json.dump(self.rows, f)
+        return result
+
+    def embed_query(self, text: str) -> List[float]:
+        """Queries are not cached; they are embedded by the wrapped model directly."""
+        return self.embeddings.embed_query(text)
@@ -11,6 +11,7 @@ from langchain_community.vectorstores import FAISS
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 from Web_Search import WebSearch, scrape_page
+from embedding_cache import CachedEmbeddings
 
 # Function to process web search results and scrape content
 def web_results(results):
@@ -29,7 +30,11 @@ def web_results(results):
                 scraped_results.append(doc)
     return scraped_results if scraped_results else "ERROR"
 
-embed_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+# embeddings go through a bounded disk cache (see embedding_cache.py)
+embed_model = CachedEmbeddings(
+    HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2"),
+    "sentence-transformers/all-MiniLM-L6-v2",
+)
 
 
 def RAG(query):
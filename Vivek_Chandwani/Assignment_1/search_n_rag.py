@@ -1,4 +1,5 @@
 from search_agent import fallback_search
+from embedding_cache import CachedEmbeddings
 from dotenv import load_dotenv
 from langchain_huggingface import HuggingFaceEndpointEmbeddings, ChatHuggingFace, HuggingFaceEndpoint
 from langchain_community.embeddings import HuggingFaceEmbeddings
@@ -29,8 +30,9 @@ def split(docs):
     return splitter.split_documents(documents)
 
 def store(chunks):
-    embeddings = HuggingFaceEndpointEmbeddings(
-        model="sentence-transformers/all-MiniLM-L6-v2"
+    embeddings = CachedEmbeddings(
+        HuggingFaceEndpointEmbeddings(model="sentence-transformers/all-MiniLM-L6-v2"),
+        "sentence-transformers/all-MiniLM-L6-v2"
     )
 
     return Chroma.from_documents(